@@ -0,0 +1,209 @@
+"""
+Benchmark harness for orbitalsim
+
+Times OrbitalSystem stepping for synthetic systems of increasing size with every engine,
+solver and integrator, and Preset construction against a fake (local, in-process) Horizons
+backend. Runs headless with no network and prints machine-readable JSON, e.g.
+
+    python benchmarks/run.py --output results.json
+    python benchmarks/run.py --sizes 10 100 1000 --quick
+"""
+import os
+import sys
+import json
+import zlib
+import math
+import time
+import argparse
+import platform
+import tempfile
+import subprocess
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from orbitalsim import horizons
+from orbitalsim.environment import OrbitalSystem
+
+# (name, engine, solver, integrator, largest N it is run for by default)
+CASES = [
+    ('python', 'python', None, None, 1000),
+    ('numpy-direct-euler', 'numpy', 'direct', 'euler', 20000),
+    ('numpy-direct-leapfrog', 'numpy', 'direct', 'leapfrog', 20000),
+    ('numpy-parallel-leapfrog', 'numpy', 'parallel', 'leapfrog', 20000),
+    ('numpy-direct-rk45', 'numpy', 'direct', 'rk45', 2000),
+    ('numpy-direct-bulirsch-stoer', 'numpy', 'direct', 'bulirsch-stoer', 2000),
+    ('numpy-barnes-hut-leapfrog', 'numpy', 'barnes-hut', 'leapfrog', 100000)
+]
+
+SIZES = [10, 100, 1000, 10000, 100000]
+
+def synthetic_system(n, engine = 'python', seed = 0):
+    # a solar-mass star with n - 1 bodies on circular orbits in a 0.5–5 AU annulus
+    rng = np.random.default_rng(seed)
+    system = OrbitalSystem(engine)
+    system.add_entity(mass = 1.99e30, diameter = 9.29e-3, name = 'star')
+    radius = rng.uniform(0.5, 5, n - 1)
+    phase = rng.uniform(0, 2 * math.pi, n - 1)
+    mass = 10 ** rng.uniform(20, 25, n - 1)
+    for r, phi, m in zip(radius, phase, mass):
+        system.add_entity(
+            mass = m,
+            position = (r * math.cos(phi), r * math.sin(phi)),
+            speed = 0.01720209895 / math.sqrt(r),
+            angle = phi - math.pi,
+            a = r
+        )
+    return system
+
+def time_case(n, engine, solver, integrator, dt, min_time, min_steps):
+    # steps per second and peak memory of one configuration
+    # memory is traced while building the system and taking the first step, timing is done untraced
+    tracemalloc.start()
+    system = synthetic_system(n, engine)
+    if solver:
+        system.set_solver(solver)
+    if integrator:
+        system.set_integrator(integrator)
+    # the first step doubles as a warm-up (first-call allocations, leapfrog's initial acceleration)
+    system.step(dt)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    if system.integrator is not None:
+        system.integrator.reset_counters()
+
+    steps = 0
+    start = time.perf_counter()
+    while steps < min_steps or time.perf_counter() - start < min_time:
+        system.step(dt)
+        steps += 1
+    elapsed = time.perf_counter() - start
+
+    result = {
+        'steps': steps,
+        'seconds': elapsed,
+        'steps_per_second': steps / elapsed,
+        'peak_memory_bytes': peak,
+        'bytes_per_body': system.memory_usage()['bytes_per_body']
+    }
+    if system.integrator is not None:
+        result['force_evaluations'] = system.integrator.force_evaluations
+    return result
+
+def benchmark_update(sizes, dt, min_time, min_steps, full):
+    results = []
+    for name, engine, solver, integrator, max_n in CASES:
+        for n in sizes:
+            if n > max_n and not full:
+                continue
+            result = time_case(n, engine, solver, integrator, dt, min_time, min_steps)
+            result.update({'case': name, 'n': n, 'dt': dt})
+            results.append(result)
+            print('{:<30} n={:<7} {:>10.2f} steps/s {:>8.0f} B/body'.format(name, n, result['steps_per_second'], result['bytes_per_body']), file = sys.stderr)
+    return results
+
+class FakeHorizons():
+    # in-process stand-in for query_horizons that sleeps for `latency` seconds per body,
+    # the round trip of its (concurrent) vectors and elements requests
+    def __init__(self, latency):
+        self.latency = latency
+        self.requests = 0
+
+    def __call__(self, entity_id, observer_id, epoch):
+        self.requests += 1
+        time.sleep(self.latency)
+        if entity_id == observer_id:
+            return {'name': 'Sun (10)'}
+        phi = zlib.crc32(str(entity_id).encode()) % 360 * math.pi / 180
+        r = 1 + len(str(entity_id))
+        return {
+            'name': 'Body {} ({})'.format(entity_id, entity_id),
+            'x': r * math.cos(phi),
+            'y': r * math.sin(phi),
+            'vx': -0.0172 * math.sin(phi) / math.sqrt(r),
+            'vy': 0.0172 * math.cos(phi) / math.sqrt(r),
+            'e': 0.01,
+            'a': r
+        }
+
+def benchmark_presets(latency):
+    # cold start (every body fetched from the fake backend) and warm start (served from the on-disk cache);
+    # the presets are built from Horizons data, not the bundled ephemeris, so that the startup is timed
+    import logging
+    from orbitalsim import presets
+
+    logging.getLogger().setLevel(logging.WARNING)
+    results = []
+    previous = horizons.get_default_cache()
+    with tempfile.TemporaryDirectory() as directory:
+        backend = FakeHorizons(latency)
+        horizons.set_default_cache(horizons.HorizonsCache(directory, backend = backend))
+        try:
+            for name in ('InnerSolarSystem', 'SolarSystem', 'EarthMoon'):
+                for start in ('cold', 'warm'):
+                    requests = backend.requests
+                    begin = time.perf_counter()
+                    getattr(presets, name)(start_date = '2020-01-01', horizons = True)
+                    results.append({
+                        'preset': name,
+                        'start': start,
+                        'seconds': time.perf_counter() - begin,
+                        'backend_requests': backend.requests - requests,
+                        'latency': latency
+                    })
+                    print('{:<30} {:<5} {:>8.3f} s'.format(name, start, results[-1]['seconds']), file = sys.stderr)
+                horizons.get_default_cache().clear()
+        finally:
+            horizons.set_default_cache(previous)
+    return results
+
+def environment():
+    try:
+        commit = subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'],
+            cwd = os.path.dirname(os.path.abspath(__file__)),
+            stderr = subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count()
+    }
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = __doc__, formatter_class = argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type = int, nargs = '+', default = SIZES, help = 'numbers of bodies to benchmark')
+    parser.add_argument('--dt', type = float, default = 0.1, help = 'timestep in days')
+    parser.add_argument('--min-time', type = float, default = 1.0, help = 'minimum seconds timed per case')
+    parser.add_argument('--min-steps', type = int, default = 3, help = 'minimum steps timed per case')
+    parser.add_argument('--latency', type = float, default = 0.2, help = 'simulated Horizons round trip in seconds')
+    parser.add_argument('--full', action = 'store_true', help = 'run every case at every size, ignoring the per-case limits')
+    parser.add_argument('--quick', action = 'store_true', help = 'short timings, for smoke-testing the harness')
+    parser.add_argument('--output', help = 'write the JSON results to this file instead of stdout')
+    args = parser.parse_args(argv)
+
+    if args.quick:
+        args.min_time, args.min_steps = 0.05, 1
+
+    results = {
+        'environment': environment(),
+        'update': benchmark_update(args.sizes, args.dt, args.min_time, args.min_steps, args.full),
+        'presets': benchmark_presets(args.latency)
+    }
+
+    output = json.dumps(results, indent = 2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,210 @@
+import time
+import numpy as np
+
+def _spread_bits(v):
+    # spreads the lower 32 bits of each integer in v so that they occupy the even bit positions
+    v = v & 0xFFFFFFFF
+    v = (v | (v << 16)) & 0x0000FFFF0000FFFF
+    v = (v | (v << 8)) & 0x00FF00FF00FF00FF
+    v = (v | (v << 4)) & 0x0F0F0F0F0F0F0F0F
+    v = (v | (v << 2)) & 0x3333333333333333
+    v = (v | (v << 1)) & 0x5555555555555555
+    return v
+
+"""
+Quadtree over a set of point masses, stored as flat arrays rather than node objects
+"""
+class QuadTree():
+    def __init__(self, positions, masses, max_depth = 21):
+        # positions: (n, 2) array of source positions
+        # masses: (n,) array of source masses
+        # max_depth: deepest level of subdivision (bodies closer than size / 2^max_depth share a leaf)
+        self.max_depth = max_depth
+        n = len(masses)
+
+        # bounding square of all the sources
+        self.origin = positions.min(axis = 0) if n else np.zeros(2)
+        extent = (positions.max(axis = 0) - self.origin).max() if n else 0
+        self.size = extent * (1 + 1e-9) if extent > 0 else 1.0
+
+        # sort the bodies along a Z-order (Morton) curve so that every node covers a contiguous run
+        keys = self.keys(positions)
+        order = np.argsort(keys, kind = 'stable')
+        self.order = order
+        keys = keys[order]
+        masses = masses[order]
+        sorted_positions = positions[order]
+        weighted = sorted_positions * masses[:, np.newaxis]
+
+        levels = []
+        next_id = 0
+        # active: sorted indices of the bodies that sit in internal nodes of the previous level
+        # body_node: id of the previous-level node each active body belongs to
+        active = np.arange(n)
+        body_node = np.full(n, -1)
+        for level in range(max_depth + 1):
+            if not active.size:
+                break
+            prefix = keys[active] >> np.int64(2 * (max_depth - level))
+            starts = np.flatnonzero(np.r_[True, prefix[1:] != prefix[:-1]])
+            counts = np.diff(np.r_[starts, active.size])
+            ids = next_id + np.arange(len(starts))
+            next_id += len(starts)
+
+            mass = np.add.reduceat(masses[active], starts)
+            com = np.add.reduceat(weighted[active], starts) / np.where(mass > 0, mass, 1)[:, np.newaxis]
+            # single bodies keep their exact position so that a body's own leaf is at zero distance
+            single = counts == 1
+            com[single] = sorted_positions[active[starts[single]]]
+            is_leaf = (counts == 1) | (level == max_depth)
+            levels.append({
+                'prefix': prefix[starts],
+                'level': np.full(len(starts), level),
+                'mass': mass,
+                'com': com,
+                'leaf': is_leaf,
+                'body_start': active[starts],
+                'body_count': counts,
+                'parent': body_node[active[starts]] if level else np.array([-1])
+            })
+
+            # descend into the internal nodes only
+            node_of_body = np.repeat(ids, counts)
+            internal = ~np.repeat(is_leaf, counts)
+            active = active[internal]
+            body_node = np.full(n, -1)
+            body_node[active] = node_of_body[internal]
+
+        def gather(field, empty):
+            return np.concatenate([l[field] for l in levels]) if levels else empty
+
+        self.prefix = gather('prefix', np.zeros(0, dtype = np.int64))
+        self.level = gather('level', np.zeros(0, dtype = np.int64))
+        self.mass = gather('mass', np.zeros(0))
+        self.com = gather('com', np.zeros((0, 2)))
+        self.leaf = gather('leaf', np.zeros(0, dtype = bool))
+        self.body_start = gather('body_start', np.zeros(0, dtype = np.int64))
+        self.body_count = gather('body_count', np.zeros(0, dtype = np.int64))
+        self.width = self.size / 2.0 ** self.level
+        self.shift = 2 * (max_depth - self.level)
+
+        # children of a node are stored contiguously, in Z-order, one level down
+        parent = gather('parent', np.zeros(0, dtype = np.int64))
+        self.child_start = np.zeros(len(self.mass), dtype = np.int64)
+        self.child_count = np.zeros(len(self.mass), dtype = np.int64)
+        has_parent = np.flatnonzero(parent >= 0)
+        parents, first, count = np.unique(parent[has_parent], return_index = True, return_counts = True)
+        self.child_start[parents] = has_parent[first]
+        self.child_count[parents] = count
+
+        self.sorted_positions = sorted_positions
+        self.sorted_masses = masses
+
+    def keys(self, positions):
+        # Morton key of the finest-level cell containing each position (clipped to the tree's square)
+        cells = np.floor((positions - self.origin) / self.size * 2 ** self.max_depth).astype(np.int64)
+        cells = np.clip(cells, 0, 2 ** self.max_depth - 1)
+        return _spread_bits(cells[:, 0]) | (_spread_bits(cells[:, 1]) << np.int64(1))
+
+    def field(self, targets, theta = 0.5, softening = 0):
+        # returns the (m, 2) acceleration field at targets divided by G, i.e. sum of m * r / |r|^3
+        # a node is treated as a point mass when width / distance < theta and it doesn't contain the target;
+        # nodes containing the target are always opened, so a body never attracts itself
+        acc = np.zeros((len(targets), 2))
+        if not len(self.mass):
+            return acc
+
+        target_keys = self.keys(targets)
+        eps_sq = softening ** 2
+        t = np.arange(len(targets))
+        node = np.zeros(len(targets), dtype = np.int64)
+        while t.size:
+            separation = self.com[node] - targets[t]
+            distance_sq = np.einsum('ij,ij->i', separation, separation)
+            contains = (target_keys[t] >> self.shift[node]) == self.prefix[node]
+            far = self.width[node] ** 2 < theta ** 2 * distance_sq
+            accept = self.leaf[node] | (far & ~contains)
+
+            # leaves at max_depth holding several (near-coincident) bodies that include the target:
+            # sum over the bodies directly so that the target's own mass is excluded
+            crowded = accept & contains & (self.body_count[node] > 1)
+            for i in np.flatnonzero(crowded):
+                start, count = self.body_start[node[i]], self.body_count[node[i]]
+                sep = self.sorted_positions[start:start + count] - targets[t[i]]
+                d_sq = np.einsum('ij,ij->i', sep, sep)
+                w = np.where(d_sq > 0, self.sorted_masses[start:start + count] / np.where(d_sq > 0, d_sq + eps_sq, 1) ** 1.5, 0)
+                acc[t[i]] += w @ sep
+            accept &= ~crowded
+
+            # point-mass contribution of every accepted node
+            a_t = t[accept]
+            a_sep = separation[accept]
+            a_dsq = distance_sq[accept]
+            weight = np.where(a_dsq > 0, self.mass[node[accept]] / np.where(a_dsq > 0, a_dsq + eps_sq, 1) ** 1.5, 0)
+            acc[:, 0] += np.bincount(a_t, weights = weight * a_sep[:, 0], minlength = len(targets))
+            acc[:, 1] += np.bincount(a_t, weights = weight * a_sep[:, 1], minlength = len(targets))
+
+            # replace every opened node by its children
+            opened = ~accept & ~crowded
+            o_t, o_node = t[opened], node[opened]
+            counts = self.child_count[o_node]
+            offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+            t = np.repeat(o_t, counts)
+            node = np.repeat(self.child_start[o_node], counts) + offsets
+
+        return acc
+
+"""
+Barnes–Hut gravity solver – O(N log N) approximation of the all-pairs force
+"""
+class BarnesHutSolver():
+    def __init__(self, theta = 0.5, max_depth = 21, chunk_size = 8192, softening = 0):
+        # theta: opening angle – larger is faster but less accurate (0 reproduces the direct sum)
+        # chunk_size: number of targets walked through the tree at once, bounds the memory used per pass
+        # softening: Plummer softening length in AU
+        self.theta = theta
+        self.max_depth = max_depth
+        self.chunk_size = chunk_size
+        self.softening = softening
+
+    def accelerations(self, targets, sources, masses):
+        # returns the acceleration field (divided by G) at targets due to the sources
+        tree = QuadTree(sources, masses, self.max_depth)
+        acc = np.zeros((len(targets), 2))
+        for start in range(0, len(targets), self.chunk_size):
+            stop = start + self.chunk_size
+            acc[start:stop] = tree.field(targets[start:stop], self.theta, self.softening)
+        return acc
+
+def compare_to_direct(positions, masses, thetas = (0.25, 0.5, 0.75, 1.0), sample = None):
+    # accuracy-vs-direct comparison used to pick theta for an error budget
+    # sample: optionally only measure the error on this many randomly chosen targets (the tree is still built over all bodies)
+    # returns a list with one dict per theta holding the relative acceleration error percentiles and timings
+    from orbitalsim.engine import DirectSolver
+
+    targets = positions
+    if sample is not None and sample < len(positions):
+        targets = positions[np.random.default_rng(0).choice(len(positions), sample, replace = False)]
+
+    start = time.perf_counter()
+    exact = DirectSolver().accelerations(targets, positions, masses)
+    direct_time = time.perf_counter() - start
+    exact_mag = np.hypot(exact[:, 0], exact[:, 1])
+    exact_mag[exact_mag == 0] = 1
+
+    results = []
+    for theta in thetas:
+        start = time.perf_counter()
+        approx = BarnesHutSolver(theta).accelerations(targets, positions, masses)
+        elapsed = time.perf_counter() - start
+
+        error = np.hypot(*(approx - exact).T) / exact_mag
+        results.append({
+            'theta': theta,
+            'median_error': float(np.median(error)),
+            'p99_error': float(np.percentile(error, 99)),
+            'max_error': float(error.max()),
+            'time': elapsed,
+            'direct_time': direct_time
+        })
+    return results
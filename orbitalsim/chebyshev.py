@@ -0,0 +1,211 @@
+import os
+import threading
+import numpy as np
+
+"""
+Chebyshev ephemerides – a propagated trajectory stored as piecewise polynomials in time
+
+The run is cut into segments and, in every segment, each body's x and y are fitted with a
+Chebyshev series in the segment's normalised time (-1 at its start, 1 at its end). Looking up a
+time is a binary search over the segment boundaries followed by evaluating the series, so
+positions at any time cost the same however long the run was, and only a few coefficients per
+body and segment are kept instead of every step.
+"""
+class ChebyshevEphemeris():
+    def __init__(self, names, boundaries, coefficients, errors = None):
+        # names: list of the bodies' names, in the order of the system
+        # boundaries: (segments + 1,) increasing array of segment start/end times in days
+        # coefficients: (segments, degree + 1, n, 2) Chebyshev coefficients of x and y in AU
+        # errors: optional (segments, n) largest deviation in AU of each fit from the samples it was fitted to
+        self.names = list(names)
+        self.boundaries = np.asarray(boundaries, dtype = float)
+        self.coefficients = np.asarray(coefficients, dtype = float)
+        self.errors = np.asarray(errors, dtype = float) if errors is not None else None
+        # coefficients of the velocity series, computed on the first velocity query (see derivative)
+        self._derivative = None
+
+    def __len__(self):
+        # number of segments
+        return len(self.coefficients)
+
+    @property
+    def start(self):
+        return float(self.boundaries[0])
+
+    @property
+    def stop(self):
+        return float(self.boundaries[-1])
+
+    def memory_usage(self):
+        arrays = (self.boundaries, self.coefficients, self.errors, self._derivative)
+        return sum(array.nbytes for array in arrays if array is not None)
+
+    def derivative(self):
+        # (segments, degree, n, 2) Chebyshev coefficients of dx/dtau and dy/dtau, differentiated once
+        # for the whole run and kept, so every velocity query costs the same as a position query
+        if self._derivative is None:
+            self._derivative = np.polynomial.chebyshev.chebder(self.coefficients, axis = 1)
+        return self._derivative
+
+    def indices(self, bodies):
+        # bodies: None (every body), a name, an index or a list of names/indices -> (k,) index array
+        if bodies is None:
+            return np.arange(len(self.names))
+        if isinstance(bodies, (str, int, np.integer)):
+            bodies = [bodies]
+        return np.array([self.names.index(body) if isinstance(body, str) else int(body) for body in bodies], dtype = np.int64)
+
+    def segments(self, times):
+        # segment index and normalised time of every time (binary search over the boundaries)
+        if times.size and (times.min() < self.boundaries[0] or times.max() > self.boundaries[-1]):
+            raise ValueError('Times must be within the fitted range [{}, {}] days'.format(self.start, self.stop))
+        segment = np.clip(np.searchsorted(self.boundaries, times, 'right') - 1, 0, len(self) - 1)
+        t0, t1 = self.boundaries[segment], self.boundaries[segment + 1]
+        return segment, (2 * times - (t0 + t1)) / (t1 - t0), t1 - t0
+
+    def evaluate(self, coefficients, segment, tau, bodies):
+        # Clenshaw's recurrence for every time at once, gathering one coefficient at a time so that
+        # memory stays at a few (times, bodies, 2) arrays (the requested bodies are selected first,
+        # which copies every segment's coefficients of those bodies, so few bodies stay cheap)
+        if len(bodies) != coefficients.shape[2] or (bodies != np.arange(len(bodies))).any():
+            coefficients = coefficients[:, :, bodies]
+        tau = tau[:, np.newaxis, np.newaxis]
+        b1 = np.zeros((len(segment), len(bodies), 2))
+        b2 = np.zeros_like(b1)
+        for j in range(coefficients.shape[1] - 1, 0, -1):
+            b1, b2 = 2 * tau * b1 - b2 + coefficients[segment, j], b1
+        return tau * b1 - b2 + coefficients[segment, 0]
+
+    def positions(self, times, bodies = None):
+        # positions in AU at times (days, a number or an array), as an (n, 2) array for a single time
+        # or a (len(times), n, 2) array; bodies: optional names/indices to restrict the result to
+        times = np.asarray(times, dtype = float)
+        bodies = self.indices(bodies)
+        if times.ndim == 0:
+            return self.series(float(times), bodies, self.coefficients)[0]
+        segment, tau, _ = self.segments(times.reshape(-1))
+        return self.evaluate(self.coefficients, segment, tau, bodies).reshape(times.shape + (len(bodies), 2))
+
+    def series(self, time, bodies, coefficients):
+        # the series with the given coefficients at a single time with as few numpy calls as possible
+        # (repeated scalar lookups): the Chebyshev polynomials at the time, then one product with the
+        # segment's coefficients; returns the (n, 2) result and the length of the segment
+        if not self.boundaries[0] <= time <= self.boundaries[-1]:
+            raise ValueError('Times must be within the fitted range [{}, {}] days'.format(self.start, self.stop))
+        segment = min(int(np.searchsorted(self.boundaries, time, 'right')) - 1, len(self) - 1)
+        t0, t1 = float(self.boundaries[segment]), float(self.boundaries[segment + 1])
+        tau = (2 * time - (t0 + t1)) / (t1 - t0)
+        terms = [1.0, tau]
+        for _ in range(coefficients.shape[1] - 2):
+            terms.append(2 * tau * terms[-1] - terms[-2])
+        coefficients = coefficients[segment][:, bodies]
+        result = np.array(terms[:len(coefficients)]) @ coefficients.reshape(len(coefficients), -1)
+        return result.reshape(len(bodies), 2), t1 - t0
+
+    def velocities(self, times, bodies = None):
+        # velocities in AU/day at times, from the derivative of the series (same shapes as positions)
+        times = np.asarray(times, dtype = float)
+        bodies = self.indices(bodies)
+        derivative = self.derivative()
+        if not derivative.shape[1]:
+            self.segments(times.reshape(-1))
+            return np.zeros(times.shape + (len(bodies), 2))
+        if times.ndim == 0:
+            result, span = self.series(float(times), bodies, derivative)
+            return result * (2 / span)
+        segment, tau, span = self.segments(times.reshape(-1))
+        result = self.evaluate(derivative, segment, tau, bodies) * (2 / span)[:, np.newaxis, np.newaxis]
+        return result.reshape(times.shape + (len(bodies), 2))
+
+    def save(self, path):
+        # write the ephemeris to path as an uncompressed .npz, atomically (see load_ephemeris)
+        temp = '{}.{}.{}.tmp'.format(path, os.getpid(), threading.get_ident())
+        arrays = {'names': np.array(self.names, dtype = str), 'boundaries': self.boundaries, 'coefficients': self.coefficients}
+        if self.errors is not None:
+            arrays['errors'] = self.errors
+        with open(temp, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(temp, path)
+
+def load_ephemeris(path):
+    # read a ChebyshevEphemeris written by ChebyshevEphemeris.save
+    with np.load(path, allow_pickle = False) as data:
+        return ChebyshevEphemeris(
+            data['names'].tolist(),
+            data['boundaries'],
+            data['coefficients'],
+            data['errors'] if 'errors' in data.files else None
+        )
+
+"""
+Streaming fitter – builds a ChebyshevEphemeris from samples as a run produces them
+"""
+class ChebyshevFitter():
+    def __init__(self, names, degree = 12, span = 8, tolerance = None):
+        # names: the bodies' names (fixes the number of bodies)
+        # degree: degree of the Chebyshev series fitted in every segment
+        # span: length of a segment in days; only the samples of the current segment are kept in memory
+        # tolerance: optional largest deviation in AU allowed between a fit and its samples;
+        #   segments that miss it are split in half (as long as each half has enough samples)
+        self.names = list(names)
+        self.degree = degree
+        self.span = span
+        self.tolerance = tolerance
+
+        # times, positions: samples of the current segment; the last sample of a segment is also the first of the next
+        self.times = []
+        self.positions = []
+        self.boundaries = []
+        self.coefficients = []
+        self.errors = []
+
+    def add(self, time, positions):
+        # add the (n, 2) positions of every body at `time` days (times must increase)
+        if len(positions) != len(self.names):
+            raise ValueError('Fitting {} bodies, got positions of {}'.format(len(self.names), len(positions)))
+        if self.times and time <= self.times[-1]:
+            raise ValueError('Samples must be added in increasing time')
+        self.times.append(float(time))
+        self.positions.append(np.array(positions, dtype = float))
+        if time - self.times[0] >= self.span * (1 - 1e-9):
+            self.flush()
+
+    def flush(self):
+        # fit the samples of the current segment and start the next one from its last sample
+        if len(self.times) < 2:
+            return
+        self.fit(np.array(self.times), np.stack(self.positions))
+        self.times, self.positions = self.times[-1:], self.positions[-1:]
+
+    def fit(self, times, positions):
+        # least-squares fit of the samples (times, positions: (m,) and (m, n, 2) arrays) with a Chebyshev
+        # series in normalised time; every coordinate of every body is fitted in one solve
+        m = len(times)
+        degree = min(self.degree, m - 1)
+        t0, t1 = times[0], times[-1]
+        vandermonde = np.polynomial.chebyshev.chebvander((2 * times - (t0 + t1)) / (t1 - t0), degree)
+        values = positions.reshape(m, -1)
+        coefficients = np.linalg.lstsq(vandermonde, values, rcond = None)[0]
+        residual = np.abs(vandermonde @ coefficients - values).reshape(positions.shape)
+        errors = residual.max(axis = (0, 2)) if len(self.names) else np.zeros(0)
+
+        if self.tolerance is not None and errors.size and errors.max() > self.tolerance and m >= 2 * (degree + 1):
+            middle = m // 2
+            self.fit(times[:middle + 1], positions[:middle + 1])
+            self.fit(times[middle:], positions[middle:])
+            return
+
+        padded = np.zeros((self.degree + 1,) + positions.shape[1:])
+        padded[:degree + 1] = coefficients.reshape((degree + 1,) + positions.shape[1:])
+        if not self.boundaries:
+            self.boundaries.append(t0)
+        self.boundaries.append(t1)
+        self.coefficients.append(padded)
+        self.errors.append(errors)
+
+    def ephemeris(self):
+        # fit any remaining samples and return the ChebyshevEphemeris of everything added so far
+        self.flush()
+        if not self.coefficients:
+            raise ValueError('At least two samples are needed to fit an ephemeris')
+        return ChebyshevEphemeris(self.names, self.boundaries, np.stack(self.coefficients), np.stack(self.errors))
@@ -0,0 +1,205 @@
+import os
+import json
+import struct
+import threading
+import numpy as np
+
+"""
+Checkpoint files
+
+A checkpoint holds the complete state of an OrbitalSystem – every body, the time, the solver,
+the integrator (including its caches and adaptive step size) and the collision detector – so that
+continuing from it gives bit-for-bit the same result as a run that was never interrupted.
+
+The layout follows trajectory files: an 8-byte magic string, a little-endian uint32 header length,
+a JSON header (padded to a 64-byte boundary) and then the raw arrays, each starting on a 64-byte
+boundary. The header lists every array's dtype, shape and offset; floats in the header are written
+with repr, which round-trips exactly.
+"""
+
+MAGIC = b'ORBCKPT1'
+VERSION = 1
+ALIGNMENT = 64
+
+# solvers by class name: (name for make_solver, options needed to rebuild it)
+SOLVERS = {
+    'DirectSolver': ('direct', ('block_size', 'softening')),
+    'ParallelSolver': ('parallel', ('processes', 'threshold', 'block_size', 'softening')),
+    'BarnesHutSolver': ('barnes-hut', ('theta', 'max_depth', 'chunk_size', 'softening'))
+}
+
+def _scalar(value):
+    # numpy scalars (e.g. an adaptive step size) as the equivalent Python value, for the JSON header
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError('{!r} can\'t be stored in a checkpoint'.format(value))
+
+def write_checkpoint(path, header, arrays):
+    # write a header dict and a dict of named arrays to path atomically: the file is written to a
+    # temporary file next to it, synced and then renamed over path, so a run that is killed while
+    # writing leaves the previous checkpoint intact
+    layout = {}
+    offset = 0
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        arrays[name] = array
+        layout[name] = {'dtype': array.dtype.newbyteorder('<').str, 'shape': list(array.shape), 'offset': offset}
+        offset += array.nbytes + (-array.nbytes % ALIGNMENT)
+
+    encoded = json.dumps(dict(header, version = VERSION, arrays = layout), default = _scalar).encode('utf-8')
+    prefix = len(MAGIC) + 4
+    encoded += b' ' * (-(prefix + len(encoded)) % ALIGNMENT)
+
+    temp = '{}.{}.{}.tmp'.format(path, os.getpid(), threading.get_ident())
+    try:
+        with open(temp, 'wb') as f:
+            f.write(MAGIC + struct.pack('<I', len(encoded)) + encoded)
+            for name, array in arrays.items():
+                f.write(array.astype(layout[name]['dtype'], copy = False).tobytes())
+                f.write(b'\0' * (-array.nbytes % ALIGNMENT))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp, path)
+    except BaseException:
+        if os.path.exists(temp):
+            os.remove(temp)
+        raise
+
+def read_checkpoint(path):
+    # returns (header, arrays) of a checkpoint file
+    with open(path, 'rb') as f:
+        data = f.read()
+    if data[:len(MAGIC)] != MAGIC:
+        raise ValueError('{} is not an orbitalsim checkpoint file'.format(path))
+    header_length, = struct.unpack('<I', data[len(MAGIC):len(MAGIC) + 4])
+    start = len(MAGIC) + 4 + header_length
+    header = json.loads(data[len(MAGIC) + 4:start].decode('utf-8'))
+    if header['version'] != VERSION:
+        raise ValueError('Unsupported checkpoint version {}'.format(header['version']))
+
+    arrays = {}
+    for name, entry in header.pop('arrays').items():
+        dtype = np.dtype(entry['dtype'])
+        count = int(np.prod(entry['shape']))
+        arrays[name] = np.frombuffer(data, dtype, count, start + entry['offset']).reshape(entry['shape'])
+    return header, arrays
+
+def save_checkpoint(path, system, metadata = None):
+    # write the state of an OrbitalSystem to path
+    # metadata: optional dict of extra JSON-serialisable information (e.g. a Simulation's date)
+    header = {
+        'engine': system.engine_name,
+        'time': system.time,
+        'sim_rate': system.sim_rate,
+        'softening': system.softening,
+        'bg': list(system.bg),
+        'names': [entity.name for entity in system.entities],
+        'next_id': system.next_id,
+        'metadata': metadata or {}
+    }
+    arrays = {
+        'positions': system.positions(),
+        'masses': system.masses(),
+        'diameters': system.diameters(),
+        'colours': system.colours(),
+        'ids': system.ids()
+    }
+    if system.engine_name == 'numpy':
+        n = len(system.entities)
+        arrays['velocities'] = system.velocities()
+        arrays['eccentricities'] = system.entities.eccentricities[:n]
+        arrays['semimajor_axes'] = system.entities.semimajor_axes[:n]
+        arrays['angles'] = system.entities.angles[:n]
+
+        name, options = SOLVERS[type(system.solver).__name__]
+        header['solver'] = {'name': name, 'options': {option: getattr(system.solver, option) for option in options}}
+
+        # the integrator's attributes: its options, counters, step size and cached force evaluations
+        from orbitalsim.integrators import INTEGRATORS
+
+        name = next(name for name, cls in INTEGRATORS.items() if type(system.integrator) is cls)
+        state = {}
+        for attribute, value in vars(system.integrator).items():
+            if isinstance(value, np.ndarray):
+                arrays['integrator.' + attribute] = value
+            else:
+                state[attribute] = value
+        header['integrator'] = {'name': name, 'state': state}
+    else:
+        # the python engine's polar velocities are stored as they are, converting them would round
+        arrays['polar_velocities'] = np.array([(entity.speed, entity.angle) for entity in system.entities], dtype = float).reshape(-1, 2)
+        arrays['eccentricities'] = np.array([entity.e for entity in system.entities], dtype = float)
+        arrays['semimajor_axes'] = np.array([entity.a for entity in system.entities], dtype = float)
+
+    detector = system.collisions
+    if detector is not None:
+        header['collisions'] = {
+            'policy': detector.policy,
+            'encounter_distance': detector.encounter_distance,
+            'restitution': detector.restitution,
+            'cell_size': detector.cell_size,
+            'log': detector.log,
+            'events': detector.events,
+            'close': [list(key) for key in detector._close],
+            'contacts': [list(key) for key in detector._contacts]
+        }
+
+    write_checkpoint(path, header, arrays)
+
+def load_checkpoint(path):
+    # returns (system, metadata): a new OrbitalSystem in the state saved in path
+    # and the metadata it was saved with
+    from orbitalsim.entities import Entity
+    from orbitalsim.environment import OrbitalSystem
+
+    header, arrays = read_checkpoint(path)
+    system = OrbitalSystem(engine = header['engine'])
+    system.time = header['time']
+    system.sim_rate = header['sim_rate']
+    system.softening = header['softening']
+    system.bg = tuple(header['bg'])
+    system.next_id = header['next_id']
+    names = header['names']
+
+    if header['engine'] == 'numpy':
+        system.set_solver(header['solver']['name'], **header['solver']['options'])
+        integrator = header['integrator']
+        system.set_integrator(integrator['name'])
+        vars(system.integrator).update(integrator['state'])
+        for name, array in arrays.items():
+            if name.startswith('integrator.'):
+                setattr(system.integrator, name[len('integrator.'):], array.copy())
+
+        indices = system.entities.extend(arrays['positions'], arrays['velocities'], arrays['masses'], arrays['diameters'], list(names), arrays['ids'])
+        system.entities.eccentricities[indices.start:indices.stop] = arrays['eccentricities']
+        system.entities.semimajor_axes[indices.start:indices.stop] = arrays['semimajor_axes']
+        system.entities.colours[indices.start:indices.stop] = arrays['colours']
+        system.entities.angles[indices.start:indices.stop] = arrays['angles']
+    else:
+        for i, name in enumerate(names):
+            x, y = arrays['positions'][i].tolist()
+            entity = Entity((x, y), float(arrays['diameters'][i]), float(arrays['masses'][i]),
+                float(arrays['eccentricities'][i]), float(arrays['semimajor_axes'][i]), name, int(arrays['ids'][i]))
+            entity.speed, entity.angle = arrays['polar_velocities'][i].tolist()
+            entity.colour = tuple(arrays['colours'][i].tolist())
+            system.entities.append(entity)
+
+    collisions = header.get('collisions')
+    if collisions is not None:
+        system.set_collisions(
+            collisions['policy'],
+            encounter_distance = collisions['encounter_distance'],
+            restitution = collisions['restitution'],
+            cell_size = collisions['cell_size'],
+            log = collisions['log']
+        )
+        detector = system.collisions
+        # JSON turns the tuples of the events into lists
+        for event in collisions['events']:
+            for key in ('indices', 'names', 'position'):
+                event[key] = tuple(event[key])
+            detector.events.append(event)
+        detector._close = set(tuple(key) for key in collisions['close'])
+        detector._contacts = set(tuple(key) for key in collisions['contacts'])
+
+    return system, header['metadata']
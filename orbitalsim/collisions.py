@@ -0,0 +1,226 @@
+import logging
+import math
+
+import numpy as np
+
+from orbitalsim.entities import cartesian_to_polar, polar_to_cartesian
+
+# policy: what happens when two bodies touch – 'merge' (perfectly inelastic, momentum and volume
+# are conserved), 'bounce' (elastic, or inelastic with restitution < 1) or 'flag' (only logged)
+POLICIES = ('merge', 'bounce', 'flag')
+
+# half of the 3x3 neighbourhood of a cell: every pair of adjacent cells is visited exactly once
+NEIGHBOURS = ((0, 0), (1, -1), (1, 0), (1, 1), (0, 1))
+
+def _cell_keys(cells):
+    # hash of integer cell coordinates; collisions of the hash only add candidates,
+    # which are discarded by the exact distance test
+    return cells[:, 0] * np.int64(2654435761) + cells[:, 1]
+
+def close_pairs(positions, reach, cell_size = None):
+    # returns (i, j) index arrays (i < j) of every pair with |r_i - r_j| < reach_i + reach_j
+    # positions: (n, 2) array, reach: (n,) array of distances around each body
+    # the bodies are binned into a uniform grid hashed by cell, so only bodies in neighbouring cells
+    # are compared and the cost is close to linear; bodies reaching further than half a cell (e.g. a sun
+    # among asteroids) are compared against every body directly
+    n = len(positions)
+    if n < 2 or not reach.max() > 0:
+        return np.zeros(0, dtype = np.int64), np.zeros(0, dtype = np.int64)
+
+    if cell_size is None:
+        typical = np.median(reach)
+        small = reach <= 8 * typical
+        cell_size = 2 * reach[small].max() if typical > 0 else 2 * reach.max()
+    large = reach > cell_size / 2
+    if cell_size <= 0 or large.all():
+        large[:] = True
+        cell_size = 1
+
+    pairs_i, pairs_j = [], []
+
+    # bodies in the grid
+    grid = np.flatnonzero(~large)
+    cells = np.floor(positions[grid] / cell_size).astype(np.int64)
+    keys = _cell_keys(cells)
+    order = np.argsort(keys, kind = 'stable')
+    sorted_keys = keys[order]
+    for dx, dy in NEIGHBOURS:
+        neighbour = _cell_keys(cells + np.array([dx, dy], dtype = np.int64))
+        lo = np.searchsorted(sorted_keys, neighbour, 'left')
+        counts = np.searchsorted(sorted_keys, neighbour, 'right') - lo
+        i = np.repeat(np.arange(len(grid)), counts)
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        j = order[np.repeat(lo, counts) + offsets]
+        if (dx, dy) == (0, 0):
+            keep = i < j
+            i, j = i[keep], j[keep]
+        pairs_i.append(grid[i])
+        pairs_j.append(grid[j])
+
+    # large bodies against everything
+    for index in np.flatnonzero(large):
+        others = np.arange(n)
+        others = others[(others != index) & (~large | (others > index))]
+        pairs_i.append(np.full(len(others), index))
+        pairs_j.append(others)
+
+    i = np.concatenate(pairs_i)
+    j = np.concatenate(pairs_j)
+    separation = positions[j] - positions[i]
+    distance_sq = np.einsum('ij,ij->i', separation, separation)
+    close = distance_sq < (reach[i] + reach[j]) ** 2
+    i, j = i[close], j[close]
+    swap = i > j
+    i[swap], j[swap] = j[swap], i[swap]
+    return i, j
+
+"""
+Collision and close-encounter detection, run after every step of an OrbitalSystem
+"""
+class CollisionDetector():
+    def __init__(self, policy = 'flag', encounter_distance = 0, restitution = 1, cell_size = None, log = True):
+        # policy: one of POLICIES, applied to bodies closer than the sum of their radii (diameter / 2)
+        # encounter_distance: in AU, pairs coming closer than this (between their surfaces) are recorded
+        #   as close encounters when they first get that close (0: no encounter tracking)
+        # restitution: fraction of the approach speed kept by bouncing bodies (1: elastic)
+        # cell_size: edge length in AU of the spatial hash grid (default: chosen from the bodies' sizes)
+        # log: whether to report every event through the logging module
+        # events: list of every event as a dict, see query
+        if policy not in POLICIES:
+            raise ValueError('Unknown collision policy {!r}, expected one of {}'.format(policy, POLICIES))
+        self.policy = policy
+        self.encounter_distance = encounter_distance
+        self.restitution = restitution
+        self.cell_size = cell_size
+        self.log = log
+        self.events = []
+        # pairs (by the bodies' uids, which survive the removal of other bodies) that were within
+        # encounter_distance / touching after the last check
+        self._close = set()
+        self._contacts = set()
+
+    def record(self, event):
+        self.events.append(event)
+        if self.log:
+            logging.info('{} of {} and {} at t = {:.6f} d ({} AU apart)'.format(
+                event['kind'].capitalize(), event['names'][0] or event['indices'][0],
+                event['names'][1] or event['indices'][1], event['time'], event['distance']
+            ))
+
+    def query(self, kind = None, name = None, start = None, stop = None):
+        # events filtered by kind ('collision' or 'encounter'), by the name of either body
+        # and by time (start <= time < stop, in days since the system was created)
+        return [
+            event for event in self.events
+            if (kind is None or event['kind'] == kind)
+            and (name is None or name in event['names'])
+            and (start is None or event['time'] >= start)
+            and (stop is None or event['time'] < stop)
+        ]
+
+    def check(self, system):
+        # detect and resolve the collisions and close encounters of the system's current state
+        positions = system.positions()
+        velocities = system.velocities()
+        radii = system.diameters() / 2
+        masses = system.masses()
+        i, j = close_pairs(positions, radii + self.encounter_distance / 2, self.cell_size)
+
+        # test particles don't interact with each other
+        massive = (masses[i] > 0) | (masses[j] > 0)
+        i, j = i[massive], j[massive]
+        separation = positions[j] - positions[i]
+        distance = np.hypot(separation[:, 0], separation[:, 1])
+        touching = distance < radii[i] + radii[j]
+
+        # a pair is recorded once when it comes within encounter_distance and once when it starts touching,
+        # not again on every step it stays that close
+        ids = system.ids()
+        keys = list(zip(ids[i].tolist(), ids[j].tolist()))
+        close = set(keys)
+        contacts = set(key for key, touches in zip(keys, touching) if touches)
+        if self.encounter_distance:
+            for key, a, b, d, touches in zip(keys, i, j, distance, touching):
+                if not touches and key not in self._close:
+                    self.record(self.event(system, 'encounter', a, b, d, positions, velocities))
+        previous = self._contacts
+        self._close, self._contacts = close, contacts
+        if not contacts:
+            return
+
+        # resolve the closest pairs first; a body absorbed earlier in this check is skipped
+        # (a second collision of the merged body is picked up after the next step)
+        keys = [key for key, touches in zip(keys, touching) if touches]
+        i, j, distance = i[touching], j[touching], distance[touching]
+        removed = set()
+        for k in np.argsort(distance, kind = 'stable'):
+            a, b, d = i[k], j[k], distance[k]
+            if a in removed or b in removed:
+                continue
+            event = self.event(system, 'collision', a, b, d, positions, velocities)
+            if self.policy == 'merge':
+                survivor, absorbed = (a, b) if masses[a] >= masses[b] else (b, a)
+                self.merge(system.entities[survivor], system.entities[absorbed])
+                removed.add(absorbed)
+                event['action'] = 'merged into {}'.format(system.entities[survivor].name or int(survivor))
+            elif self.policy == 'bounce':
+                self.bounce(system.entities[a], system.entities[b])
+                event['action'] = 'bounced'
+            elif keys[k] in previous:
+                continue
+            self.record(event)
+        if removed:
+            system.remove_entities(sorted(removed))
+
+    def event(self, system, kind, a, b, distance, positions, velocities):
+        relative_velocity = velocities[b] - velocities[a]
+        return {
+            'time': system.time,
+            'kind': kind,
+            'indices': (int(a), int(b)),
+            'names': (system.entities[a].name, system.entities[b].name),
+            'distance': float(distance),
+            'relative_speed': float(np.hypot(*relative_velocity)),
+            'position': tuple(float(x) for x in (positions[a] + positions[b]) / 2),
+            'action': None
+        }
+
+    def merge(self, survivor, absorbed):
+        # perfectly inelastic collision: the survivor takes the combined mass and momentum, the
+        # centre of mass as position and the diameter of the combined volume
+        m1, m2 = survivor.mass, absorbed.mass
+        v1 = np.array(polar_to_cartesian(survivor.speed, survivor.angle))
+        v2 = np.array(polar_to_cartesian(absorbed.speed, absorbed.angle))
+        if m1 + m2 > 0:
+            survivor.x = (m1 * survivor.x + m2 * absorbed.x) / (m1 + m2)
+            survivor.y = (m1 * survivor.y + m2 * absorbed.y) / (m1 + m2)
+            survivor.speed, survivor.angle = cartesian_to_polar(*((m1 * v1 + m2 * v2) / (m1 + m2)))
+        survivor.mass = m1 + m2
+        survivor.diameter = (survivor.diameter ** 3 + absorbed.diameter ** 3) ** (1 / 3)
+
+    def bounce(self, first, second):
+        # exchange momentum along the line of centres and push the bodies apart until they just touch
+        # (a test particle is reflected off a massive body without moving it)
+        p1, p2 = np.array([first.x, first.y]), np.array([second.x, second.y])
+        v1 = np.array(polar_to_cartesian(first.speed, first.angle))
+        v2 = np.array(polar_to_cartesian(second.speed, second.angle))
+        if first.mass and second.mass:
+            w1, w2 = 1 / first.mass, 1 / second.mass
+        else:
+            w1, w2 = (0, 1) if first.mass else (1, 0)
+        normal = p2 - p1
+        distance = math.hypot(*normal)
+        normal = normal / distance if distance > 0 else np.array([1.0, 0.0])
+
+        approach = (v1 - v2) @ normal
+        if approach > 0:
+            impulse = (1 + self.restitution) * approach / (w1 + w2)
+            first.speed, first.angle = cartesian_to_polar(*(v1 - impulse * w1 * normal))
+            second.speed, second.angle = cartesian_to_polar(*(v2 + impulse * w2 * normal))
+
+        overlap = (first.diameter + second.diameter) / 2 - distance
+        if overlap > 0:
+            p1 -= overlap * w1 / (w1 + w2) * normal
+            p2 += overlap * w2 / (w1 + w2) * normal
+            first.x, first.y = p1
+            second.x, second.y = p2
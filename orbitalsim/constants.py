@@ -0,0 +1,34 @@
+"""
+Physical constants resolved once at import time
+
+The core of orbitalsim works in AU, kg and days. The constants below are derived
+from exact/CODATA 2018 values so that no unit parsing (and no astropy import) is
+needed on the hot path; astropy is only loaded by resolve_unit_system() for unit
+systems that are not precomputed here.
+"""
+
+# Newtonian constant of gravitation in m^3 * kg^-1 * s^-2 (CODATA 2018, same value as astropy.constants.G)
+G_SI = 6.6743e-11
+# astronomical unit in m (IAU 2012, exact)
+AU = 149597870700.0
+# day in s
+DAY = 86400.0
+
+# G in each of the precomputed unit systems, keyed by (length, mass, time)
+UNIT_SYSTEMS = {
+    ('AU', 'kg', 'd'): G_SI * DAY ** 2 / AU ** 3,
+    ('km', 'kg', 's'): G_SI * 1e-9,
+    ('m', 'kg', 's'): G_SI,
+}
+
+# for consistency, G = [AU^3 * kg^-1 * d^-2]
+G = UNIT_SYSTEMS[('AU', 'kg', 'd')]
+
+def resolve_unit_system(length = 'AU', mass = 'kg', time = 'd'):
+    # returns G expressed in length^3 * mass^-1 * time^-2
+    # unit systems that aren't precomputed are converted with astropy once and cached
+    key = (length, mass, time)
+    if key not in UNIT_SYSTEMS:
+        from astropy.constants import G as G_astropy
+        UNIT_SYSTEMS[key] = G_astropy.to('{}3 / ({} {}2)'.format(length, mass, time)).value
+    return UNIT_SYSTEMS[key]
@@ -0,0 +1,186 @@
+import numpy as np
+
+from orbitalsim.constants import G
+
+"""
+Exact all-pairs gravity solver
+"""
+class DirectSolver():
+    def __init__(self, block_size = 2 ** 20, softening = 0):
+        # block_size: upper bound on the number of pairwise entries held in memory at once
+        # keeps the all-pairs pass at O(N) memory for large systems
+        # softening: Plummer softening length in AU, bounds the force between very close bodies
+        self.block_size = block_size
+        self.softening = softening
+
+    def accelerations(self, targets, sources, masses):
+        # returns the (m, 2) acceleration field (divided by G) at targets due to the sources:
+        # a_i = sum_j m_j * (r_j - r_i) / (|r_j - r_i|^2 + softening^2)^1.5
+        # pairs at zero separation are skipped, so a body never attracts itself
+        acc = np.zeros((len(targets), 2))
+        if not len(masses):
+            return acc
+
+        # process the targets in blocks so that the (block, n, 2) separation array stays bounded
+        block = max(1, self.block_size // len(masses))
+        for start in range(0, len(targets), block):
+            stop = min(start + block, len(targets))
+            separation = sources[np.newaxis, :, :] - targets[start:stop, np.newaxis, :]
+            distance_sq = np.einsum('ijk,ijk->ij', separation, separation)
+            if self.softening:
+                distance_sq = np.where(distance_sq == 0, 0, distance_sq + self.softening ** 2)
+            distance_sq[distance_sq == 0] = np.inf
+            inv_cube = distance_sq ** -1.5
+            acc[start:stop] = np.einsum('ij,ijk->ik', inv_cube * masses, separation)
+
+        return acc
+
+def make_solver(name, **options):
+    # solver: 'direct' (exact, O(N^2)), 'parallel' (direct, split across processes)
+    # or 'barnes-hut' (quadtree approximation, O(N log N))
+    if name == 'direct':
+        return DirectSolver(**options)
+    if name == 'parallel':
+        from orbitalsim.parallel import ParallelSolver
+        return ParallelSolver(**options)
+    if name == 'barnes-hut':
+        from orbitalsim.barneshut import BarnesHutSolver
+        return BarnesHutSolver(**options)
+    raise ValueError('Unknown solver {!r}'.format(name))
+
+"""
+Vectorised state engine – positions, velocities and masses are kept in contiguous
+Cartesian NumPy arrays and all pairwise accelerations are computed in one batched pass
+"""
+class NumpyEngine():
+    def __init__(self, capacity = 16, solver = None, integrator = None):
+        # capacity: initial number of rows allocated for the state arrays (grows by doubling)
+        # solver: object computing the gravitational field (default: DirectSolver)
+        # integrator: object advancing the state arrays (default: semi-implicit Euler)
+        # n: number of bodies currently stored
+        self.n = 0
+        self._positions = np.zeros((capacity, 2))
+        self._velocities = np.zeros((capacity, 2))
+        self._masses = np.zeros(capacity)
+
+        # for consistency, G = [AU^3 * kg^-1 * d^-2]
+        self.G = G
+        self.solver = solver if solver is not None else DirectSolver()
+        if integrator is None:
+            from orbitalsim.integrators import Euler
+            integrator = Euler()
+        self.integrator = integrator
+
+    """
+    State arrays – views trimmed to the bodies actually stored
+    """
+
+    @property
+    def positions(self):
+        # (n, 2) array of x, y positions in AU
+        return self._positions[:self.n]
+
+    @property
+    def velocities(self):
+        # (n, 2) array of x, y velocities in AU/day
+        return self._velocities[:self.n]
+
+    @property
+    def masses(self):
+        # (n,) array of masses in kg
+        return self._masses[:self.n]
+
+    def _grow(self, capacity):
+        # reallocate the state arrays with room for at least `capacity` bodies
+        capacity = max(capacity, 2 * len(self._masses))
+        for name in ('_positions', '_velocities', '_masses'):
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:])
+            new[:self.n] = old[:self.n]
+            setattr(self, name, new)
+
+    def add(self, position, velocity, mass):
+        # appends a body and returns its row index in the state arrays
+        if self.n == len(self._masses):
+            self._grow(self.n + 1)
+        index = self.n
+        self._positions[index] = position
+        self._velocities[index] = velocity
+        self._masses[index] = mass
+        self.n += 1
+        return index
+
+    def extend(self, positions, velocities, masses):
+        # appends a batch of bodies in one copy and returns the range of their row indices
+        count = len(masses)
+        if self.n + count > len(self._masses):
+            self._grow(self.n + count)
+        indices = range(self.n, self.n + count)
+        self._positions[self.n:self.n + count] = positions
+        self._velocities[self.n:self.n + count] = velocities
+        self._masses[self.n:self.n + count] = masses
+        self.n += count
+        return indices
+
+    def remove(self, indices):
+        # deletes the bodies at the given row indices, keeping the others in order
+        keep = np.ones(self.n, dtype = bool)
+        keep[indices] = False
+        n = int(keep.sum())
+        for name in ('_positions', '_velocities', '_masses'):
+            array = getattr(self, name)
+            array[:n] = array[:self.n][keep]
+            array[n:self.n] = 0
+        self.n = n
+
+    def massive(self):
+        # row indices of the bodies that exert gravity; bodies of zero mass are test particles,
+        # which are pulled by the massive bodies but pull on nothing themselves
+        return np.flatnonzero(self.masses)
+
+    def memory_usage(self):
+        # bytes held by the state arrays (including spare capacity)
+        return self._positions.nbytes + self._velocities.nbytes + self._masses.nbytes
+
+    """
+    Physics calculations
+    """
+
+    def accelerations(self, positions = None):
+        # returns the (n, 2) array of gravitational accelerations in AU/day^2 acting on every body
+        # only massive bodies are used as sources, so test particles cost O(n_massive) each
+        if positions is None:
+            positions = self.positions
+        massive = self.massive()
+        if self.n < 2 or len(massive) == 0:
+            return np.zeros((self.n, 2))
+        if len(massive) == self.n:
+            return self.G * self.solver.accelerations(positions, positions, self.masses)
+        return self.G * self.solver.accelerations(positions, positions[massive], self.masses[massive])
+
+    def step(self, days):
+        # advances the system by `days` using the engine's integrator
+        self.integrator.step(self, days)
+
+    def energy(self):
+        # total (kinetic + potential) energy of the system in kg * AU^2 / day^2, used to measure integrator drift
+        # (test particles have no mass, so only pairs of massive bodies contribute)
+        kinetic = 0.5 * np.sum(self.masses * np.einsum('ij,ij->i', self.velocities, self.velocities))
+        massive = self.massive()
+        positions, masses, n = self.positions[massive], self.masses[massive], len(massive)
+        potential = 0.0
+        block = max(1, 2 ** 20 // max(n, 1))
+        for start in range(0, n, block):
+            stop = min(start + block, n)
+            separation = positions[np.newaxis, :, :] - positions[start:stop, np.newaxis, :]
+            distance = np.sqrt(np.einsum('ijk,ijk->ij', separation, separation))
+            # count every pair once (j > i)
+            mask = np.arange(n)[np.newaxis, :] > np.arange(start, stop)[:, np.newaxis]
+            pairs = np.where(mask & (distance > 0), masses[start:stop, np.newaxis] * masses / np.where(distance > 0, distance, 1), 0)
+            potential -= self.G * pairs.sum()
+        return kinetic + potential
+
+    def compare_solvers(self, thetas = (0.25, 0.5, 0.75, 1.0), sample = None):
+        # measures the Barnes–Hut error against the direct sum on the current state for each theta
+        from orbitalsim.barneshut import compare_to_direct
+        return compare_to_direct(self.positions.copy(), self.masses.copy(), thetas, sample)
@@ -0,0 +1,197 @@
+import multiprocessing
+import numpy as np
+
+from orbitalsim.constants import G
+
+def _propagate_chunk(args):
+    # worker entry point: propagate a slice of the ensemble and hand back its arrays
+    ensemble, days, dt = args
+    ensemble.propagate(days, dt)
+    return ensemble
+
+"""
+Ensemble of perturbed copies of one system, propagated together as (K, N, 2) arrays
+"""
+class Ensemble():
+    def __init__(
+        self,
+        system,
+        copies,
+        mass_sigma = 0,
+        velocity_sigma = 0,
+        position_sigma = 0,
+        include_base = True,
+        seed = None
+    ):
+        # system: the base OrbitalSystem – its initial conditions are read once, so a preset's
+        #   Horizons data is only fetched for the base and not for every copy
+        # copies: number of copies K
+        # mass_sigma: relative standard deviation of the normal perturbation applied to each mass
+        # velocity_sigma: relative standard deviation of the perturbation applied to each velocity component
+        #   (scaled by the body's speed)
+        # position_sigma: standard deviation in AU of the perturbation applied to each position component
+        # include_base: if true, copy 0 is left unperturbed as a reference
+        # seed: seed for the perturbations, for reproducible ensembles
+        self.names = [entity.name for entity in system.entities]
+        base_positions = system.positions()
+        base_velocities = system.velocities()
+        base_masses = np.array([entity.mass for entity in system.entities], dtype = float)
+        n = len(base_masses)
+
+        rng = np.random.default_rng(seed)
+        speeds = np.hypot(base_velocities[:, 0], base_velocities[:, 1])
+        self.masses = base_masses * (1 + mass_sigma * rng.standard_normal((copies, n)))
+        self.velocities = base_velocities + velocity_sigma * speeds[:, np.newaxis] * rng.standard_normal((copies, n, 2))
+        self.positions = base_positions + position_sigma * rng.standard_normal((copies, n, 2))
+        if include_base and copies:
+            self.masses[0] = base_masses
+            self.velocities[0] = base_velocities
+            self.positions[0] = base_positions
+
+        self.time = 0
+        # upper bound on the number of pairwise entries held in memory at once
+        self.block_size = 2 ** 20
+
+        # statistics tracked over the run, one value per copy
+        self.initial_energy = self.energy()
+        self.min_separation = np.full(copies, np.inf)
+        self.max_distance = self.distances().max(axis = 1) if n else np.zeros(copies)
+        self._acc = None
+
+    def __len__(self):
+        return len(self.masses)
+
+    """
+    Physics calculations
+    """
+
+    def accelerations(self):
+        # (K, N, 2) gravitational accelerations in AU/day^2 of every body in every copy;
+        # also updates the closest approach seen in each copy (between a body and a massive one)
+        # only massive bodies are sources (test particles stay massless in every copy), and the pairs are
+        # evaluated in blocks of copies, or of target rows when one copy has more pairs than block_size
+        copies, n = self.masses.shape
+        acc = np.zeros((copies, n, 2))
+        sources = np.flatnonzero(self.masses.any(axis = 0))
+        s = len(sources)
+        block = max(1, self.block_size // max(n * s, 1))
+        rows = max(1, self.block_size // max(block * s, 1))
+        for start in range(0, copies, block):
+            stop = min(start + block, copies)
+            positions = self.positions[start:stop]
+            source_positions = positions[:, sources]
+            source_masses = self.masses[start:stop, sources]
+            for first in range(0, n, rows):
+                last = min(first + rows, n)
+                separation = source_positions[:, np.newaxis, :, :] - positions[:, first:last, np.newaxis, :]
+                distance_sq = np.einsum('kijd,kijd->kij', separation, separation)
+                distance_sq[:, np.arange(first, last)[:, np.newaxis] == sources[np.newaxis, :]] = np.inf
+                if n > 1 and s:
+                    self.min_separation[start:stop] = np.minimum(
+                        self.min_separation[start:stop],
+                        np.sqrt(distance_sq.min(axis = (1, 2)))
+                    )
+                inv_cube = distance_sq ** -1.5
+                acc[start:stop, first:last] = np.einsum('kij,kijd->kid', inv_cube * source_masses[:, np.newaxis, :], separation)
+        return G * acc
+
+    def step(self, days):
+        # advance every copy by `days` with a leapfrog (kick-drift-kick) step
+        if self._acc is None:
+            self._acc = self.accelerations()
+        self.velocities += 0.5 * days * self._acc
+        self.positions += self.velocities * days
+        self._acc = self.accelerations()
+        self.velocities += 0.5 * days * self._acc
+        self.time += days
+        self.max_distance = np.maximum(self.max_distance, self.distances().max(axis = 1))
+
+    def propagate(self, days, dt = 1 / 24, processes = None):
+        # advance every copy by `days` using fixed steps of dt days
+        # processes: if given, the copies are split across this many worker processes
+        #   instead of being propagated as one batch in this process
+        if processes and processes > 1 and len(self) > 1:
+            chunks = [self.subset(indices) for indices in np.array_split(np.arange(len(self)), min(processes, len(self)))]
+            with multiprocessing.get_context().Pool(len(chunks)) as pool:
+                chunks = pool.map(_propagate_chunk, [(chunk, days, dt) for chunk in chunks])
+            for name in ('positions', 'velocities', 'masses', 'initial_energy', 'min_separation', 'max_distance'):
+                setattr(self, name, np.concatenate([getattr(chunk, name) for chunk in chunks]))
+            self.time = chunks[0].time
+            self._acc = None
+            return self
+
+        steps = int(days // dt)
+        for _ in range(steps):
+            self.step(dt)
+        remainder = days - steps * dt
+        if remainder > 1e-12 * dt:
+            self.step(remainder)
+        return self
+
+    def subset(self, indices):
+        # a new Ensemble holding only the copies at indices
+        subset = Ensemble.__new__(Ensemble)
+        subset.__dict__.update(self.__dict__)
+        for name in ('positions', 'velocities', 'masses', 'initial_energy', 'min_separation', 'max_distance'):
+            setattr(subset, name, getattr(self, name)[indices].copy())
+        subset._acc = None
+        return subset
+
+    """
+    Summary statistics
+    """
+
+    def energy(self):
+        # (K,) total energy of each copy in kg * AU^2 / day^2
+        # the potential is summed over the pairs i < j in the same blocks of copies as accelerations,
+        # and in blocks of rows i when a single copy has more pairs than block_size
+        kinetic = 0.5 * np.sum(self.masses * np.einsum('kid,kid->ki', self.velocities, self.velocities), axis = 1)
+        copies, n = self.masses.shape
+        potential = np.zeros(copies)
+        block = max(1, self.block_size // max(n * n, 1))
+        rows = max(1, self.block_size // max(block * n, 1))
+        for start in range(0, copies, block):
+            stop = min(start + block, copies)
+            positions = self.positions[start:stop]
+            masses = self.masses[start:stop]
+            for first in range(0, n, rows):
+                last = min(first + rows, n)
+                separation = positions[:, first + 1:, np.newaxis, :] - positions[:, np.newaxis, first:last, :]
+                distance = np.sqrt(np.einsum('kjid,kjid->kji', separation, separation))
+                upper = np.arange(first + 1, n)[:, np.newaxis] > np.arange(first, last)[np.newaxis, :]
+                pairs = masses[:, first + 1:, np.newaxis] * masses[:, np.newaxis, first:last] / np.where(upper, distance, 1)
+                potential[start:stop] += np.sum(np.where(upper, pairs, 0), axis = (1, 2))
+        return kinetic - G * potential
+
+    def distances(self):
+        # (K, N) distance of every body from its copy's barycentre in AU
+        total = self.masses.sum(axis = 1)[:, np.newaxis]
+        barycentre = np.einsum('ki,kid->kd', self.masses, self.positions) / total
+        offset = self.positions - barycentre[:, np.newaxis, :]
+        return np.hypot(offset[..., 0], offset[..., 1])
+
+    def escaped(self):
+        # (K, N) boolean – bodies that are unbound from the most massive body of their copy
+        central = np.argmax(self.masses, axis = 1)
+        index = np.arange(len(self))
+        r = self.positions - self.positions[index, central][:, np.newaxis, :]
+        v = self.velocities - self.velocities[index, central][:, np.newaxis, :]
+        distance = np.hypot(r[..., 0], r[..., 1])
+        mu = G * (self.masses + self.masses[index, central][:, np.newaxis])
+        specific_energy = 0.5 * np.einsum('kid,kid->ki', v, v) - mu / np.where(distance > 0, distance, np.inf)
+        unbound = specific_energy > 0
+        unbound[index, central] = False
+        return unbound
+
+    def summary(self):
+        # one dict of statistics per copy
+        energy = self.energy()
+        escaped = self.escaped()
+        return [{
+            'copy': k,
+            'time': self.time,
+            'energy_error': float(abs((energy[k] - self.initial_energy[k]) / self.initial_energy[k])) if self.initial_energy[k] else 0.0,
+            'min_separation': float(self.min_separation[k]),
+            'max_distance': float(self.max_distance[k]),
+            'escaped': [self.names[i] for i in np.flatnonzero(escaped[k])]
+        } for k in range(len(self))]
@@ -1,5 +1,8 @@
+import sys
 import math
-from astropy.constants import G
+import numpy as np
+
+from orbitalsim.constants import G
 
 def add_vectors(vector1, vector2):
     # vectors are quantities with a magnitude and direction
@@ -18,11 +21,29 @@ def add_vectors(vector1, vector2):
 
     return (mag, angle)
 
+def days_per_update(sim_rate, delta_t):
+    # returns the number of days that pass in a given interval delta_t (ms)
+    # sim_rate: number of days that pass in the simulation for every real life second (realtime is 1.2e-5)
+    return 1 / ( (1000 / sim_rate) / delta_t )
+
+def polar_to_cartesian(speed, angle):
+    # converts a (speed, angle) velocity into its x, y components
+    # the angle is measured clockwise from the +y axis, matching Entity.move
+    return (speed * math.sin(angle), -speed * math.cos(angle))
+
+def cartesian_to_polar(vx, vy):
+    # inverse of polar_to_cartesian
+    return (math.hypot(vx, vy), math.atan2(vx, -vy))
+
 """
 Main entity class
 """
 class Entity():
-    def __init__(self, position, diameter, mass, e = 0, a = 1, name = ''):
+    # fixed attribute slots instead of a per-instance __dict__; simulation-wide settings
+    # such as sim_rate live once on the OrbitalSystem rather than on every body
+    __slots__ = ('x', 'y', 'diameter', 'mass', 'e', 'a', 'colour', 'name', 'speed', 'angle', 'uid')
+
+    def __init__(self, position, diameter, mass, e = 0, a = 1, name = '', uid = -1):
         # position: tuple (x, y) describing the distance in AU from the centre of the system (0, 0)
         # diameter: measured in AU
         # mass: measured in kg
@@ -30,46 +51,45 @@ class Entity():
         # angle: angle of initial velocity given in rad
         # (if applicable) e: orbit eccentricity, 0-1
         # (if applicable) a: semi-major axis measured in AU
+        # uid: id of the body, unique within its OrbitalSystem and kept when other bodies are removed
         self.x, self.y = position
         self.diameter = diameter
         self.mass = mass
-        self.density = self.mass / (4/3 * math.pi * (self.diameter/2)**3)
         self.e = e
         self.a = a
         self.colour = (255, 255, 255)
         self.name = name
+        self.uid = uid
 
         self.speed = 0
         self.angle = 0
 
-        # sim_rate: externally set, describes the number of days that pass in the simulation for every real life second (realtime is 1.2e-5)
-        # delta_t: the time in ms between frames used to keep simulation rate consistent
-        self.sim_rate = 1
-        self.delta_t = 16
+    @property
+    def density(self):
+        return self.mass / (4/3 * math.pi * (self.diameter/2)**3)
 
-    def days_per_update(self):
-        # returns the number of days that pass in a given interval delta_t
-        return 1 / ( (1000 / self.sim_rate) / self.delta_t )
+    def memory_usage(self):
+        # approximate number of bytes held by this entity and its attribute values
+        return sys.getsizeof(self) + sum(sys.getsizeof(getattr(self, slot)) for slot in Entity.__slots__)
 
     """
     Physics calculations for movement
     """
 
-    def move(self):
-        # adjust speed for days past per frame
-        # calculates next x, y position 
-        dpu = self.days_per_update()
-        self.x += math.sin(self.angle) * self.speed * dpu
-        self.y -= math.cos(self.angle) * self.speed * dpu # subtract because of pygame's coord system
+    def move(self, days):
+        # calculates next x, y position after `days` have passed
+        self.x += math.sin(self.angle) * self.speed * days
+        self.y -= math.cos(self.angle) * self.speed * days # subtract because of pygame's coord system
 
-    def accelerate(self, acceleration):
-        # adjusts magnitude of acceleration for days past per frame
+    def accelerate(self, acceleration, days):
+        # adjusts magnitude of acceleration for the days passed
         # combine apply acceleration to velocity vector
         acc_mag, acc_angle = acceleration
-        acc_mag *= self.days_per_update()
+        acc_mag *= days
         self.speed, self.angle = add_vectors((self.speed, self.angle), (acc_mag, acc_angle))
 
-    def attract(self, other):
+    def attract(self, other, days, softening = 0):
+        # softening: Plummer softening length in AU, bounds the force between very close bodies
         dx = self.x - other.x
         dy = self.y - other.y
         theta = math.atan2(dy, dx)
@@ -77,16 +97,212 @@ class Entity():
 
         # calculate attractive force due to gravity using Newton's law of universal gravitation:
         # F = G * m1 * m2 / r^2
-        # for consistency, G = [AU^3 * kg^-1 * d^-2]
-        force = G.to('AU3 / (kg d2)').value * self.mass * other.mass / (distance ** 2)
+        # for consistency, G = [AU^3 * kg^-1 * d^-2] (see orbitalsim.constants)
+        # accelerate both bodies towards each other by acceleration vector a = F/m, rearranged from Newton's second law;
+        # the mass cancels out (a1 = G * m2 / r^2), which keeps massless test particles well defined
+        # with softening the field is Plummer's, G * m * r / (r^2 + softening^2)^1.5, as in the numpy solvers
+        if softening:
+            factor = distance / (distance ** 2 + softening ** 2) ** 1.5
+        else:
+            factor = 1 / (distance ** 2)
+        self.accelerate((G * other.mass * factor, theta - (math.pi / 2)), days)
+        other.accelerate((G * self.mass * factor, theta + (math.pi / 2)), days)
+
+
+"""
+Struct-of-arrays entity store used by the numpy engine
+"""
+class EntityRegistry():
+    def __init__(self, engine):
+        # engine: the NumpyEngine holding positions, velocities and masses;
+        # the registry holds the remaining per-body information in arrays of its own,
+        # so a body costs a few dozen bytes and no Python object until it is looked up
+        self.engine = engine
+        self.diameters = np.zeros(len(engine._masses))
+        self.eccentricities = np.zeros(len(engine._masses))
+        self.semimajor_axes = np.zeros(len(engine._masses))
+        self.colours = np.zeros((len(engine._masses), 3), dtype = np.uint8)
+        self.ids = np.zeros(len(engine._masses), dtype = np.int64)
+        # angles: last angle set through a view, the direction of a body at rest (see EntityView.angle)
+        self.angles = np.zeros(len(engine._masses))
+        self.names = []
+
+    def __len__(self):
+        return len(self.names)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [EntityView(self, i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('entity index out of range')
+        return EntityView(self, index)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield EntityView(self, index)
+
+    def _grow(self, n):
+        # if the engine grew its arrays, grow ours to the same capacity, keeping the first n rows
+        capacity = len(self.engine._masses)
+        if capacity == len(self.diameters):
+            return
+        for field in ('diameters', 'eccentricities', 'semimajor_axes', 'colours', 'ids', 'angles'):
+            old = getattr(self, field)
+            new = np.zeros((capacity,) + old.shape[1:], dtype = old.dtype)
+            new[:n] = old[:n]
+            setattr(self, field, new)
+
+    def add(self, position, velocity, mass, diameter, e = 0, a = 1, name = '', uid = -1):
+        # appends a body to the engine and the registry, returns its index
+        index = self.engine.add(position, velocity, mass)
+        self._grow(index)
+        self.diameters[index] = diameter
+        self.eccentricities[index] = e
+        self.semimajor_axes[index] = a
+        self.colours[index] = (255, 255, 255)
+        self.ids[index] = uid
+        self.angles[index] = cartesian_to_polar(*velocity)[1]
+        self.names.append(name)
+        return index
+
+    def extend(self, positions, velocities, masses, diameter, names = None, uids = -1):
+        # appends a batch of bodies in one copy, returns the range of their indices
+        indices = self.engine.extend(positions, velocities, masses)
+        self._grow(indices.start)
+        self.diameters[indices.start:indices.stop] = diameter
+        self.eccentricities[indices.start:indices.stop] = 0
+        self.semimajor_axes[indices.start:indices.stop] = 1
+        self.colours[indices.start:indices.stop] = (255, 255, 255)
+        self.ids[indices.start:indices.stop] = uids
+        self.angles[indices.start:indices.stop] = 0
+        self.names.extend(names if names is not None else [''] * len(indices))
+        return indices
+
+    def remove(self, indices):
+        # deletes the bodies at the given indices from the engine and the registry
+        indices = np.asarray(indices, dtype = np.int64)
+        keep = np.ones(len(self), dtype = bool)
+        keep[indices] = False
+        n = int(keep.sum())
+        for field in ('diameters', 'eccentricities', 'semimajor_axes', 'colours', 'ids', 'angles'):
+            array = getattr(self, field)
+            array[:n] = array[:len(self)][keep]
+        self.names = [name for name, kept in zip(self.names, keep) if kept]
+        self.engine.remove(indices)
+
+    def memory_usage(self):
+        # bytes held by the registry's arrays and names (the engine's arrays are counted by the engine)
+        arrays = self.diameters.nbytes + self.eccentricities.nbytes + self.semimajor_axes.nbytes + self.colours.nbytes + self.ids.nbytes + self.angles.nbytes
+        return arrays + sys.getsizeof(self.names) + sum(sys.getsizeof(name) for name in self.names)
+
+"""
+Entity backed by the state arrays of a NumpyEngine
+"""
+class EntityView(Entity):
+    # a lightweight handle to one row of an EntityRegistry (and its engine); every attribute
+    # is read from and written to the arrays, so the physics methods inherited from Entity keep working
+    __slots__ = ('registry', 'index')
+
+    def __init__(self, registry, index):
+        self.registry = registry
+        self.index = index
+
+    @property
+    def engine(self):
+        return self.registry.engine
+
+    @property
+    def x(self):
+        return float(self.engine.positions[self.index, 0])
+
+    @x.setter
+    def x(self, value):
+        self.engine.positions[self.index, 0] = value
+
+    @property
+    def y(self):
+        return float(self.engine.positions[self.index, 1])
+
+    @y.setter
+    def y(self, value):
+        self.engine.positions[self.index, 1] = value
+
+    @property
+    def mass(self):
+        return float(self.engine.masses[self.index])
+
+    @mass.setter
+    def mass(self, value):
+        self.engine.masses[self.index] = value
+
+    @property
+    def speed(self):
+        return cartesian_to_polar(*self.engine.velocities[self.index])[0]
+
+    @speed.setter
+    def speed(self, value):
+        self.engine.velocities[self.index] = polar_to_cartesian(value, self.angle)
+
+    @property
+    def angle(self):
+        # a zero velocity has no direction, so a body at rest keeps the angle it was last given
+        # (like an Entity), and setting its speed afterwards moves it in that direction
+        vx, vy = self.engine.velocities[self.index]
+        if vx == 0 and vy == 0:
+            return float(self.registry.angles[self.index])
+        return cartesian_to_polar(vx, vy)[1]
+
+    @angle.setter
+    def angle(self, value):
+        self.registry.angles[self.index] = value
+        self.engine.velocities[self.index] = polar_to_cartesian(self.speed, value)
+
+    @property
+    def diameter(self):
+        return float(self.registry.diameters[self.index])
+
+    @diameter.setter
+    def diameter(self, value):
+        self.registry.diameters[self.index] = value
+
+    @property
+    def e(self):
+        return float(self.registry.eccentricities[self.index])
+
+    @e.setter
+    def e(self, value):
+        self.registry.eccentricities[self.index] = value
+
+    @property
+    def a(self):
+        return float(self.registry.semimajor_axes[self.index])
 
-        # accelerate both bodies towards each other by acceleration vector a = F/m, rearranged from Newton's second law
-        self.accelerate((force / self.mass, theta - (math.pi / 2)))
-        other.accelerate((force / other.mass, theta + (math.pi / 2)))
+    @a.setter
+    def a(self, value):
+        self.registry.semimajor_axes[self.index] = value
 
+    @property
+    def colour(self):
+        return tuple(int(c) for c in self.registry.colours[self.index])
 
+    @colour.setter
+    def colour(self, value):
+        self.registry.colours[self.index] = value
 
-        
+    @property
+    def name(self):
+        return self.registry.names[self.index]
 
+    @name.setter
+    def name(self, value):
+        self.registry.names[self.index] = value
 
+    @property
+    def uid(self):
+        return int(self.registry.ids[self.index])
 
+    @uid.setter
+    def uid(self, value):
+        self.registry.ids[self.index] = value
@@ -1,11 +1,250 @@
-from orbitalsim.entities import Entity
+import sys
+from bisect import bisect_right
+import numpy as np
+
+from orbitalsim.entities import Entity, EntityRegistry, cartesian_to_polar, days_per_update, polar_to_cartesian
+
+# engine: 'python' steps each Entity in turn using polar vectors (original behaviour);
+# 'numpy' keeps the whole system in Cartesian arrays and computes all forces in one pass
+ENGINES = ('python', 'numpy')
 
 class OrbitalSystem():
-    def __init__(self):
+    def __init__(self, engine = 'python'):
         self.entities = []
 
         self.bg = (0, 0, 0)
 
+        # sim_rate: number of days that pass in the simulation for every real life second
+        # (set by Simulation, used by update to convert delta_t into days for every entity)
+        # time: number of simulated days elapsed since the system was created
+        self.sim_rate = 1
+        self.time = 0
+
+        # next_id: uid given to the next body added (see Entity), ids are never reused
+        self.next_id = 0
+
+        # recorder: TrajectoryWriter receiving a snapshot every record_every steps (see record)
+        self.recorder = None
+        self.record_every = 1
+        self.steps_since_record = 0
+
+        # softening: Plummer softening length in AU applied to every gravitational interaction (see set_softening)
+        # collisions: CollisionDetector run after every step, if any (see set_collisions)
+        self.softening = 0
+        self.collisions = None
+
+        self.engine_name = 'python'
+        self.engine = None
+        self.solver = None
+        self.integrator = None
+        self.set_engine(engine)
+
+    def set_engine(self, engine):
+        # switch the physics engine, carrying over any entities already in the system
+        if engine not in ENGINES:
+            raise ValueError('Unknown engine {!r}, expected one of {}'.format(engine, ENGINES))
+
+        # the python engine keeps a list of Entity objects; the numpy engine keeps an EntityRegistry,
+        # which stores every per-body attribute in arrays and hands out EntityView handles on access
+        entities = list(self.entities)
+        self.engine_name = engine
+        if engine == 'numpy':
+            from orbitalsim.engine import NumpyEngine
+            self.engine = NumpyEngine(capacity = max(16, len(entities)), solver = self.solver, integrator = self.integrator)
+            self.solver = self.engine.solver
+            self.solver.softening = self.softening
+            self.integrator = self.engine.integrator
+            self.entities = EntityRegistry(self.engine)
+        else:
+            # the solver is kept for a later switch back, but its workers (if any) are stopped meanwhile
+            if hasattr(self.solver, 'close'):
+                self.solver.close()
+            self.engine = None
+            self.entities = []
+
+        # the entities keep their uids (next_id is restored after re-adding them)
+        next_id = self.next_id
+        for entity in entities:
+            self.add_entity(
+                diameter = entity.diameter,
+                mass = entity.mass,
+                position = (entity.x, entity.y),
+                speed = entity.speed,
+                angle = entity.angle,
+                e = entity.e,
+                a = entity.a,
+                name = entity.name
+            )
+            self.entities[-1].colour = entity.colour
+            self.entities[-1].uid = entity.uid
+        self.next_id = next_id
+
+    def positions(self):
+        # (n, 2) array of every entity's x, y position in AU
+        if self.engine_name == 'numpy':
+            return self.engine.positions.copy()
+        return np.array([(entity.x, entity.y) for entity in self.entities], dtype = float).reshape(-1, 2)
+
+    def velocities(self):
+        # (n, 2) array of every entity's x, y velocity in AU/day
+        if self.engine_name == 'numpy':
+            return self.engine.velocities.copy()
+        return np.array([polar_to_cartesian(entity.speed, entity.angle) for entity in self.entities], dtype = float).reshape(-1, 2)
+
+    def masses(self):
+        # (n,) array of every entity's mass in kg
+        if self.engine_name == 'numpy':
+            return self.engine.masses.copy()
+        return np.array([entity.mass for entity in self.entities], dtype = float)
+
+    def diameters(self):
+        # (n,) array of every entity's diameter in AU
+        if self.engine_name == 'numpy':
+            return self.entities.diameters[:len(self.entities)].copy()
+        return np.array([entity.diameter for entity in self.entities], dtype = float)
+
+    def names(self):
+        # list of every entity's name
+        if self.engine_name == 'numpy':
+            return list(self.entities.names)
+        return [entity.name for entity in self.entities]
+
+    def ids(self):
+        # (n,) array of every entity's uid
+        if self.engine_name == 'numpy':
+            return self.entities.ids[:len(self.entities)].copy()
+        return np.array([entity.uid for entity in self.entities], dtype = np.int64)
+
+    def colours(self):
+        # (n, 3) array of every entity's RGB colour
+        if self.engine_name == 'numpy':
+            return self.entities.colours[:len(self.entities)].copy()
+        return np.array([entity.colour for entity in self.entities], dtype = np.uint8).reshape(-1, 3)
+
+    def remove_entities(self, indices):
+        # delete the entities at the given indices (e.g. bodies absorbed in a merger)
+        if self.recorder is not None:
+            raise ValueError('Entities can\'t be removed while recording, the trajectory file has a fixed number of bodies')
+        if self.engine_name == 'numpy':
+            self.entities.remove(indices)
+        else:
+            indices = set(int(i) for i in indices)
+            self.entities = [entity for i, entity in enumerate(self.entities) if i not in indices]
+
+    def memory_usage(self):
+        # approximate memory held by the system's bodies, returns a dict with the total number
+        # of bytes, the number of bodies and the bytes per body
+        if self.engine_name == 'numpy':
+            total = self.engine.memory_usage() + self.entities.memory_usage()
+        else:
+            total = sys.getsizeof(self.entities) + sum(entity.memory_usage() for entity in self.entities)
+        bodies = len(self.entities)
+        return {
+            'bytes': total,
+            'bodies': bodies,
+            'bytes_per_body': total / bodies if bodies else 0
+        }
+
+    def record(self, path, every = 1, metadata = None, chunk_size = 1024):
+        # stream snapshots (time, x, y, vx, vy of every body) to a trajectory file at path,
+        # one snapshot now and then one every `every` steps; see orbitalsim.recording
+        from orbitalsim.recording import TrajectoryWriter
+
+        if self.collisions is not None and self.collisions.policy == 'merge':
+            raise ValueError('Merging collisions remove bodies, which a trajectory file can\'t represent')
+        self.stop_recording()
+        self.recorder = TrajectoryWriter(
+            path,
+            names = [entity.name for entity in self.entities],
+            masses = [entity.mass for entity in self.entities],
+            diameters = [entity.diameter for entity in self.entities],
+            colours = [entity.colour for entity in self.entities],
+            metadata = metadata,
+            chunk_size = chunk_size
+        )
+        self.record_every = every
+        self.steps_since_record = 0
+        self.recorder.write(self.time, self.positions(), self.velocities())
+
+    def stop_recording(self):
+        # flush and close the trajectory file, if one is being recorded
+        if self.recorder is not None:
+            self.recorder.close()
+            self.recorder = None
+
+    def checkpoint(self, path, metadata = None):
+        # write the complete state of the system to path, atomically, so that a run can be resumed
+        # bit for bit with orbitalsim.checkpoint.load_checkpoint (a trajectory being recorded isn't
+        # part of the state, call record again after restoring); see orbitalsim.checkpoint
+        from orbitalsim.checkpoint import save_checkpoint
+
+        save_checkpoint(path, self, metadata)
+
+    def snapshot(self):
+        # called after every step to pass a snapshot to the recorder when one is due
+        self.steps_since_record += 1
+        if self.steps_since_record >= self.record_every:
+            self.steps_since_record = 0
+            self.recorder.write(self.time, self.positions(), self.velocities())
+
+    def set_solver(self, solver, **options):
+        # choose how the numpy engine evaluates gravity: 'direct' (exact all-pairs),
+        # 'parallel' (exact all-pairs across processes, options: processes, threshold) or
+        # 'barnes-hut' (quadtree approximation, options: theta, max_depth, chunk_size)
+        from orbitalsim.engine import make_solver
+
+        if self.engine_name != 'numpy':
+            raise ValueError('Solvers require the numpy engine, call set_engine(\'numpy\') first')
+        options.setdefault('softening', self.softening)
+        previous = self.solver
+        self.solver = make_solver(solver, **options)
+        self.engine.solver = self.solver
+        self.engine.integrator.reset_cache()
+        # the replaced solver may hold worker processes and shared memory (ParallelSolver)
+        if previous is not None and hasattr(previous, 'close'):
+            previous.close()
+
+    def set_softening(self, softening):
+        # Plummer softening length in AU: every interaction uses G * m * r / (r^2 + softening^2)^1.5,
+        # which bounds the force between very close bodies (0: exact Newtonian gravity)
+        self.softening = softening
+        if self.engine_name == 'numpy':
+            self.engine.solver.softening = softening
+            self.engine.integrator.reset_cache()
+
+    def set_collisions(self, policy = 'flag', **options):
+        # detect collisions (bodies closer than the sum of their radii) and close encounters after every step
+        # policy: 'merge', 'bounce' or 'flag' (options: encounter_distance, restitution, cell_size, log)
+        # the events are kept in system.collisions.events and can be filtered with system.collisions.query
+        # policy None turns detection off
+        from orbitalsim.collisions import CollisionDetector
+
+        if policy is None:
+            self.collisions = None
+            return
+        if policy == 'merge' and self.recorder is not None:
+            raise ValueError('Merging collisions remove bodies, which a trajectory file can\'t represent')
+        self.collisions = CollisionDetector(policy, **options)
+
+    def set_integrator(self, integrator, **options):
+        # choose how the numpy engine advances in time: 'euler' (default), 'leapfrog' (symplectic),
+        # 'rk45' or 'bulirsch-stoer' (adaptive, options: rtol, atol, max_step) or
+        # 'wisdom-holman' (Kepler orbits around a dominant central body plus interaction kicks, option: central)
+        # the integrator's force_evaluations and steps counters are available as system.integrator
+        from orbitalsim.integrators import make_integrator
+
+        if self.engine_name != 'numpy':
+            raise ValueError('Integrators require the numpy engine, call set_engine(\'numpy\') first')
+        self.integrator = make_integrator(integrator, **options)
+        self.engine.integrator = self.integrator
+
+    def compare_solvers(self, thetas = (0.25, 0.5, 0.75, 1.0), sample = None):
+        # accuracy-vs-direct comparison of the Barnes–Hut solver on the current state,
+        # returns the relative acceleration error percentiles and timings for each theta
+        if self.engine_name != 'numpy':
+            raise ValueError('Solvers require the numpy engine, call set_engine(\'numpy\') first')
+        return self.engine.compare_solvers(thetas, sample)
+
     def add_entity(
         self,
         diameter = 8.5e-5,
@@ -15,19 +254,121 @@ class OrbitalSystem():
         angle = 0,
         e = 0,
         a = 1,
-        name = ''
+        name = '',
+        massless = False
     ):
-        entity = Entity(position, diameter, mass, e, a, name)
+        # massless: add a test particle, which is pulled by the massive bodies but pulls on nothing
+        # (its mass is stored as 0, so particles also ignore each other)
+        if massless:
+            mass = 0
+        uid = self.next_id
+        self.next_id += 1
+        if self.engine_name == 'numpy':
+            index = self.entities.add(position, polar_to_cartesian(speed, angle), mass, diameter, e, a, name, uid)
+            self.entities.angles[index] = angle
+            return
+
+        entity = Entity(position, diameter, mass, e, a, name, uid)
         entity.speed = speed
         entity.angle = angle
 
         self.entities.append(entity)
 
-    def update(self, delta_t):
+    def add_particles(self, positions, velocities = None, diameter = 1e-6, names = None):
+        # add a batch of massless test particles (e.g. an asteroid belt) in one go
+        # positions: (n, 2) array in AU, velocities: (n, 2) Cartesian array in AU/day (default: at rest)
+        # with the numpy engine the batch is copied into the state arrays at once, and each step costs
+        # O(n_massive * n) instead of O(n^2)
+        positions = np.asarray(positions, dtype = float).reshape(-1, 2)
+        velocities = np.zeros_like(positions) if velocities is None else np.asarray(velocities, dtype = float).reshape(-1, 2)
+        if names is not None and len(names) != len(positions):
+            raise ValueError('Expected {} names, got {}'.format(len(positions), len(names)))
+
+        if self.engine_name == 'numpy':
+            uids = np.arange(self.next_id, self.next_id + len(positions))
+            self.next_id += len(positions)
+            self.entities.extend(positions, velocities, np.zeros(len(positions)), diameter, names, uids)
+            return
+
+        for i, (position, velocity) in enumerate(zip(positions, velocities)):
+            speed, angle = cartesian_to_polar(*velocity)
+            self.add_entity(
+                diameter = diameter,
+                position = tuple(position),
+                speed = speed,
+                angle = angle,
+                name = names[i] if names is not None else '',
+                massless = True
+            )
+
+    def interactions(self):
+        # yields every entity with the entities it interacts with that come after it in the list:
+        # a massive entity interacts with all of them, a test particle only with the massive ones
+        massive = [i for i, entity in enumerate(self.entities) if entity.mass]
         for i, entity in enumerate(self.entities):
-            entity.delta_t = delta_t
-            entity.move()
-            entity.accelerate((0, 0))
+            if entity.mass:
+                yield entity, self.entities[i + 1:]
+            else:
+                yield entity, [self.entities[j] for j in massive[bisect_right(massive, i):]]
+
+    def update(self, delta_t):
+        # advance the system by the number of days that pass in an interval of delta_t ms
+        # (frame-based stepping, see step)
+        self.step(days_per_update(self.sim_rate, delta_t))
+
+    def step(self, days):
+        # advance the system by a fixed timestep given in days, independent of any frame timing
+        if self.engine_name == 'numpy':
+            self.engine.step(days)
+        else:
+            for entity, others in self.interactions():
+                entity.move(days)
+
+                for entity2 in others:
+                    entity.attract(entity2, days, self.softening)
+        self.time += days
+        if self.collisions is not None:
+            self.collisions.check(self)
+        if self.recorder is not None:
+            self.snapshot()
+
+    def propagate(self, days, dt = 1 / 24, callback = None, skip = 0):
+        # headless propagation: advance the system by `days` using fixed steps of `dt` days
+        # (the last step is shortened to land exactly on `days`)
+        # callback: optional function called with the system after every step
+        # skip: number of steps of this propagation that were already taken (to resume it from a checkpoint)
+        # no pygame or wall-clock timing is involved, so runs are reproducible and as fast as the engine allows
+        if dt <= 0:
+            raise ValueError('dt must be positive')
+
+        steps = int(days // dt)
+        remainder = days - steps * dt
+        for _ in range(skip, steps):
+            self.step(dt)
+            if callback:
+                callback(self)
+        if remainder > 1e-12 * dt and skip <= steps:
+            self.step(remainder)
+            if callback:
+                callback(self)
+        return self
+
+    def fit_ephemeris(self, days, dt = 1 / 24, span = 8, degree = 12, tolerance = None, callback = None):
+        # propagate the system by `days` (see propagate) and fit every body's trajectory with piecewise
+        # Chebyshev series of `degree` over segments of `span` days (split further where a fit misses
+        # `tolerance` AU); returns a ChebyshevEphemeris answering position queries at any time in the run
+        # without re-simulating; see orbitalsim.chebyshev
+        from orbitalsim.chebyshev import ChebyshevFitter
+
+        if self.collisions is not None and self.collisions.policy == 'merge':
+            raise ValueError('Merging collisions remove bodies, which an ephemeris can\'t represent')
+        fitter = ChebyshevFitter(self.names(), degree, span, tolerance)
+        fitter.add(self.time, self.positions())
+
+        def sample(system):
+            fitter.add(system.time, system.positions())
+            if callback:
+                callback(system)
 
-            for entity2 in self.entities[i + 1:]:
-                entity.attract(entity2)
+        self.propagate(days, dt, sample)
+        return fitter.ephemeris()
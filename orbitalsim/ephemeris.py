@@ -0,0 +1,144 @@
+"""
+Bundled offline ephemeris for the preset bodies
+
+The states are computed from mean Keplerian elements and their secular rates, so the presets can
+start instantly and without network access. This is the same kind of data Horizons returns, but
+less accurate: for the planets (JPL "Approximate Positions of the Planets", valid 1800-2050) the
+error is at the arcminute level, and for the Moon (mean lunar elements, no periodic terms) it is
+about a degree. Use Horizons (horizons = True on the presets) when accuracy matters.
+"""
+
+import math
+
+# J2000 epoch as a julian date
+J2000 = 2451545.0
+
+# heliocentric mean elements, referred to the mean ecliptic and equinox of J2000, in the form
+# (a [AU], e, I [deg], L [deg], longitude of perihelion [deg], longitude of the ascending node [deg])
+# at J2000, followed by their rates per Julian century
+PLANETS = {
+    '1': ('Mercury (1)',
+        (0.38709927, 0.20563593, 7.00497902, 252.25032350, 77.45779628, 48.33076593),
+        (0.00000037, 0.00001906, -0.00594749, 149472.67411175, 0.16047689, -0.12534081)),
+    '2': ('Venus (2)',
+        (0.72333566, 0.00677672, 3.39467605, 181.97909950, 131.60246718, 76.67984255),
+        (0.00000390, -0.00004107, -0.00078890, 58517.81538729, 0.00268329, -0.27769418)),
+    '3': ('Earth-Moon (3)',
+        (1.00000261, 0.01671123, -0.00001531, 100.46457166, 102.93768193, 0.0),
+        (0.00000562, -0.00004392, -0.01294668, 35999.37244981, 0.32327364, 0.0)),
+    '4': ('Mars (4)',
+        (1.52371034, 0.09339410, 1.84969142, -4.55343205, -23.94362959, 49.55953891),
+        (0.00001847, 0.00007882, -0.00813131, 19140.30268499, 0.44441088, -0.29257343)),
+    '5': ('Jupiter (5)',
+        (5.20288700, 0.04838624, 1.30439695, 34.39644051, 14.72847983, 100.47390909),
+        (-0.00011607, -0.00013253, -0.00183714, 3034.74612775, 0.21252668, 0.20469106)),
+    '6': ('Saturn (6)',
+        (9.53667594, 0.05386179, 2.48599187, 49.95424423, 92.59887831, 113.66242448),
+        (-0.00125060, -0.00050991, 0.00193609, 1222.49362201, -0.41897216, -0.28867794)),
+    '7': ('Uranus (7)',
+        (19.18916464, 0.04725744, 0.77263783, 313.23810451, 170.95427630, 74.01692503),
+        (-0.00196176, -0.00004397, -0.00242939, 428.48202785, 0.40805281, 0.04240589)),
+    '8': ('Neptune (8)',
+        (30.06992276, 0.00859048, 1.77004347, -55.12002969, 44.96476227, 131.78422574),
+        (0.00026291, 0.00005105, 0.00035372, 218.45945325, -0.32241464, -0.00508664)),
+    '9': ('Pluto (9)',
+        (39.48211675, 0.24882730, 17.14001206, 238.92903833, 224.06891629, 110.30393684),
+        (-0.00031596, 0.00005170, 0.00004818, 145.20780515, -0.04062942, -0.01183482)),
+}
+
+# geocentric mean elements of the Moon in the same form
+MOON = ('Moon (301)',
+    (0.00256955529, 0.0549, 5.145, 218.3164477, 83.3532465, 125.04452),
+    (0.0, 0.0, 0.0, 481267.88123421, 4069.0137287, -1934.136261))
+# Moon / Earth mass ratio, places the Moon relative to the Earth-Moon barycentre
+MOON_EARTH_MASS_RATIO = 0.0123000371
+
+NAMES = {'sun': 'Sun (10)', '10': 'Sun (10)', '301': MOON[0]}
+NAMES.update({id_: name for id_, (name, _, _) in PLANETS.items()})
+
+class EphemerisUnavailable(LookupError):
+    # raised for bodies or observers that aren't in the bundled tables
+    pass
+
+def orbital_state(elements, rates, epoch):
+    # position (x, y, z) and velocity (vx, vy, vz) in AU and AU/day at the julian date epoch,
+    # from mean elements at J2000 and their rates per century
+    centuries = (epoch - J2000) / 36525
+    a, e, inclination, mean_longitude, perihelion, node = (
+        value + rate * centuries for value, rate in zip(elements, rates)
+    )
+    # mean motion in rad/day, from the rate of the mean longitude
+    n = math.radians(rates[3]) / 36525
+    inclination, perihelion, node = math.radians(inclination), math.radians(perihelion), math.radians(node)
+    argument = perihelion - node
+    mean_anomaly = math.remainder(math.radians(mean_longitude) - perihelion, 2 * math.pi)
+
+    # Kepler's equation M = E - e sin E, by Newton's method
+    anomaly = mean_anomaly + e * math.sin(mean_anomaly)
+    for _ in range(50):
+        correction = (anomaly - e * math.sin(anomaly) - mean_anomaly) / (1 - e * math.cos(anomaly))
+        anomaly -= correction
+        if abs(correction) < 1e-15:
+            break
+
+    # position and velocity in the orbital plane (x towards perihelion)
+    cos_e, sin_e = math.cos(anomaly), math.sin(anomaly)
+    root = math.sqrt(1 - e * e)
+    px, py = a * (cos_e - e), a * root * sin_e
+    rate = n / (1 - e * cos_e)
+    vx, vy = -a * sin_e * rate, a * root * cos_e * rate
+
+    # rotate into the ecliptic frame
+    cw, sw = math.cos(argument), math.sin(argument)
+    co, so = math.cos(node), math.sin(node)
+    ci, si = math.cos(inclination), math.sin(inclination)
+    xx, xy = cw * co - sw * so * ci, -sw * co - cw * so * ci
+    yx, yy = cw * so + sw * co * ci, -sw * so + cw * co * ci
+    zx, zy = sw * si, cw * si
+    return (
+        (xx * px + xy * py, yx * px + yy * py, zx * px + zy * py),
+        (xx * vx + xy * vy, yx * vx + yy * vy, zx * vx + zy * vy)
+    )
+
+def heliocentric_state(entity_id, epoch):
+    # ecliptic state of a bundled body relative to the sun, returns (position, velocity, e, a)
+    entity_id = str(entity_id).lower()
+    if entity_id in ('sun', '10'):
+        return (0, 0, 0), (0, 0, 0), 0, 0
+    if entity_id in PLANETS:
+        _, elements, rates = PLANETS[entity_id]
+        position, velocity = orbital_state(elements, rates, epoch)
+        return position, velocity, elements[1], elements[0]
+    if entity_id == '301':
+        # the Moon orbits the Earth-Moon barycentre at 1 / (1 + mass ratio) of its distance from the Earth
+        _, elements, rates = MOON
+        scale = 1 / (1 + MOON_EARTH_MASS_RATIO)
+        position, velocity = orbital_state(elements, rates, epoch)
+        barycentre, barycentre_velocity, _, _ = heliocentric_state('3', epoch)
+        return (
+            tuple(b + scale * p for b, p in zip(barycentre, position)),
+            tuple(b + scale * v for b, v in zip(barycentre_velocity, velocity)),
+            elements[1],
+            elements[0] * scale
+        )
+    raise EphemerisUnavailable(
+        'No bundled ephemeris for body {!r} (available: {}), query Horizons instead'.format(entity_id, ', '.join(sorted(NAMES)))
+    )
+
+def bundled_state(entity_id, observer_id, epoch):
+    # state of entity_id relative to observer_id at the julian date epoch, as a dict in the same form
+    # as orbitalsim.horizons.query_horizons (x, y, vx, vy, e, a and the name; only the name when
+    # entity_id == observer_id), so it can stand in for Horizons wherever that is used
+    entity_id, observer_id = str(entity_id).lower(), str(observer_id).lower()
+    if entity_id not in NAMES:
+        heliocentric_state(entity_id, epoch)
+    data = {'name': NAMES[entity_id]}
+    if NAMES[entity_id] == NAMES.get(observer_id):
+        return data
+
+    position, velocity, e, a = heliocentric_state(entity_id, epoch)
+    origin, origin_velocity, _, _ = heliocentric_state(observer_id, epoch)
+    data['x'], data['y'] = position[0] - origin[0], position[1] - origin[1]
+    data['vx'], data['vy'] = velocity[0] - origin_velocity[0], velocity[1] - origin_velocity[1]
+    data['e'], data['a'] = e, a
+    return data
@@ -0,0 +1,205 @@
+import os
+import json
+import math
+import time
+import hashlib
+import threading
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+"""
+Access to JPL SSD Horizons with a persistent on-disk cache
+"""
+
+# Julian date of the J2000 epoch (2000-01-01 12:00)
+J2000 = datetime.datetime(2000, 1, 1, 12)
+
+def julian_date(date):
+    # julian date of a datetime, computed without astropy so that cache lookups stay import-free
+    return 2451545.0 + (date - J2000).total_seconds() / 86400
+
+def query_horizons(entity_id, observer_id, epoch):
+    # fetches the state of entity_id relative to observer_id at the julian date epoch from Horizons
+    # returns a dict with the position (x, y) in AU, velocity (vx, vy) in AU/day, eccentricity e,
+    # semi-major axis a in AU and the target name; only the name is set when entity_id == observer_id
+    from astroquery.jplhorizons import Horizons
+
+    def query(table):
+        obj = Horizons(
+            id = entity_id,
+            location = '@{}'.format(observer_id),
+            epochs = epoch,
+            id_type = 'id'
+        )
+        return getattr(obj, table)()
+
+    if entity_id == observer_id:
+        # obj.elements() does not work for when entity_id and observer_id are the same
+        return {'name': str(query('vectors')['targetname'].data[0])}
+
+    # the vectors and elements tables are separate requests, run them side by side
+    with ThreadPoolExecutor(max_workers = 2) as pool:
+        vectors, elements = pool.map(query, ('vectors', 'elements'))
+
+    data = {'name': str(vectors['targetname'].data[0])}
+    for column in ('x', 'y', 'vx', 'vy'):
+        data[column] = float(vectors[column].data[0])
+    data['e'] = float(elements['e'].data[0])
+    data['a'] = float(elements['a'].data[0])
+    return data
+
+class HorizonsCacheMiss(LookupError):
+    # raised in offline mode when a query isn't in the cache
+    pass
+
+class HorizonsCache():
+    def __init__(
+        self,
+        directory,
+        ttl = 30 * 86400,
+        max_bytes = 64 * 2 ** 20,
+        offline = False,
+        backend = query_horizons,
+        resolution = None
+    ):
+        # directory: where cached responses are stored, one small JSON file per query
+        # ttl: seconds after which a cached response is refetched (None: never expires)
+        # max_bytes: total size of the cache, the least recently used entries are evicted beyond it
+        # offline: if true, never touch the network and raise HorizonsCacheMiss on a miss
+        # backend: function (entity_id, observer_id, epoch) -> dict used on a miss (e.g. a local stand-in for tests)
+        # resolution: None keeps exact epochs; a number of days rounds every epoch down to a multiple of it
+        #   from midnight UTC before it is used (1: the start of the UTC day), so that queries at different
+        #   times of the day share entries – at the cost of getting the state at the rounded epoch
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.offline = offline
+        self.backend = backend
+        self.resolution = resolution
+
+        # hits, misses: counters for the lifetime of the cache object
+        self.hits = 0
+        self.misses = 0
+
+    def key_epoch(self, epoch):
+        # the epoch as it is stored and queried: rounded down to the resolution (julian dates start at noon,
+        # so days are counted from JD x.5)
+        if self.resolution is None:
+            return float(epoch)
+        return (math.floor((epoch - 0.5) / self.resolution) * self.resolution) + 0.5
+
+    def path(self, entity_id, observer_id, epoch):
+        # content-addressed file name: hash of the (entity_id, observer_id, epoch) key
+        key = json.dumps([str(entity_id), str(observer_id), repr(self.key_epoch(epoch))])
+        return os.path.join(self.directory, hashlib.sha256(key.encode('utf-8')).hexdigest() + '.json')
+
+    def get(self, entity_id, observer_id, epoch):
+        # returns the cached response or None if it is missing or expired
+        path = self.path(entity_id, observer_id, epoch)
+        try:
+            with open(path, 'r', encoding = 'utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if self.ttl is not None and time.time() - entry['created'] > self.ttl:
+            self._remove(path)
+            return None
+        # touch the file so that eviction removes the least recently used entries first
+        os.utime(path)
+        return entry['data']
+
+    def put(self, entity_id, observer_id, epoch, data):
+        os.makedirs(self.directory, exist_ok = True)
+        path = self.path(entity_id, observer_id, epoch)
+        entry = {
+            'key': [str(entity_id), str(observer_id), self.key_epoch(epoch)],
+            'created': time.time(),
+            'data': data
+        }
+        # write to a temporary file first so that a concurrent reader never sees a partial entry
+        temp = '{}.{}.{}.tmp'.format(path, os.getpid(), threading.get_ident())
+        with open(temp, 'w', encoding = 'utf-8') as f:
+            json.dump(entry, f)
+        os.replace(temp, path)
+        self.evict()
+
+    def fetch(self, entity_id, observer_id, epoch):
+        # cached response if available, otherwise query the backend and store the result
+        # (the backend is queried at the rounded epoch, so the response always matches its key)
+        epoch = self.key_epoch(epoch)
+        data = self.get(entity_id, observer_id, epoch)
+        if data is not None:
+            self.hits += 1
+            return data
+
+        self.misses += 1
+        if self.offline:
+            raise HorizonsCacheMiss('No cached Horizons data for entity {} observed from {} at JD {}'.format(entity_id, observer_id, epoch))
+        data = self.backend(entity_id, observer_id, epoch)
+        self.put(entity_id, observer_id, epoch, data)
+        return data
+
+    def entries(self):
+        # list of (path, size, last access time) for every cached response
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return []
+        entries = []
+        for name in names:
+            if name.endswith('.json'):
+                path = os.path.join(self.directory, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def evict(self):
+        # drop the least recently used entries until the cache fits in max_bytes
+        # (expired entries are dropped when they are next read)
+        entries = self.entries()
+        if self.max_bytes is not None:
+            total = sum(size for _, size, _ in entries)
+            for path, size, _ in sorted(entries, key = lambda e: e[2]):
+                if total <= self.max_bytes:
+                    break
+                self._remove(path)
+                total -= size
+
+    def clear(self):
+        for path, _, _ in self.entries():
+            self._remove(path)
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+"""
+Process-wide default cache used by Simulation
+"""
+
+_default_cache = False
+
+def get_default_cache():
+    # the cache used by new Simulation objects, created on first use from the environment:
+    # ORBITALSIM_CACHE_DIR: cache directory (default ~/.cache/orbitalsim/horizons)
+    # ORBITALSIM_OFFLINE: set to 1 to never query Horizons and fail fast on a cache miss
+    global _default_cache
+    if _default_cache is False:
+        directory = os.environ.get(
+            'ORBITALSIM_CACHE_DIR',
+            os.path.join(os.path.expanduser('~'), '.cache', 'orbitalsim', 'horizons')
+        )
+        offline = os.environ.get('ORBITALSIM_OFFLINE', '') not in ('', '0')
+        _default_cache = HorizonsCache(directory, offline = offline)
+    return _default_cache
+
+def set_default_cache(cache):
+    # replace the cache used by new Simulation objects (None: always query Horizons directly)
+    global _default_cache
+    _default_cache = cache
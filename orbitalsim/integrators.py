@@ -0,0 +1,287 @@
+import numpy as np
+
+"""
+Parent class for integrators – advances the state arrays of a NumpyEngine
+"""
+class Integrator():
+    # adaptive: whether the integrator picks its own internal step size
+    adaptive = False
+
+    def __init__(self):
+        # force_evaluations: number of times the gravitational field has been evaluated
+        # steps: number of internal steps taken (including rejected ones for adaptive integrators)
+        self.force_evaluations = 0
+        self.steps = 0
+
+    def reset_counters(self):
+        self.force_evaluations = 0
+        self.steps = 0
+
+    def reset_cache(self):
+        # forget any force evaluation kept from the previous step (called when the force law changes)
+        pass
+
+    def accelerations(self, engine, positions):
+        # counted force evaluation
+        self.force_evaluations += 1
+        return engine.accelerations(positions)
+
+    def derivative(self, engine, state):
+        # state: (2, n, 2) array of stacked positions and velocities
+        # returns d(state)/dt = (velocities, accelerations)
+        return np.stack((state[1], self.accelerations(engine, state[0])))
+
+    def step(self, engine, days):
+        # advance engine.positions/engine.velocities in place by `days`
+        raise NotImplementedError
+
+"""
+First-order integrators
+"""
+class Euler(Integrator):
+    # semi-implicit Euler: move every body, then apply the accelerations from the new positions
+    # (the original behaviour of OrbitalSystem.update)
+    def step(self, engine, days):
+        engine.positions[:] += engine.velocities * days
+        engine.velocities[:] += self.accelerations(engine, engine.positions) * days
+        self.steps += 1
+
+"""
+Symplectic leapfrog (kick-drift-kick / velocity Verlet), second order
+"""
+class Leapfrog(Integrator):
+    def __init__(self):
+        super().__init__()
+        # the acceleration at the end of a step is reused at the start of the next one,
+        # so each step costs a single force evaluation
+        self._positions = None
+        self._acc = None
+
+    def reset_cache(self):
+        self._acc = None
+
+    def step(self, engine, days):
+        # the cached acceleration is only valid if nothing has moved or been added since the last step
+        if self._acc is None or self._positions.shape != engine.positions.shape or not np.array_equal(self._positions, engine.positions):
+            self._acc = self.accelerations(engine, engine.positions)
+
+        engine.velocities[:] += 0.5 * days * self._acc
+        engine.positions[:] += engine.velocities * days
+        self._acc = self.accelerations(engine, engine.positions)
+        engine.velocities[:] += 0.5 * days * self._acc
+
+        self._positions = engine.positions.copy()
+        self.steps += 1
+
+"""
+Parent class for adaptive integrators
+"""
+class AdaptiveIntegrator(Integrator):
+    adaptive = True
+
+    def __init__(self, rtol = 1e-9, atol = 1e-12, max_step = None):
+        # rtol, atol: relative and absolute tolerance on every position (AU) and velocity (AU/day) component
+        # max_step: optional upper bound on the internal step size in days
+        super().__init__()
+        self.rtol = rtol
+        self.atol = atol
+        self.max_step = max_step
+        # h: internal step size in days, carried over between calls
+        self.h = None
+
+    def error_norm(self, error, state, new_state):
+        # max-norm of the error scaled by the tolerances, <= 1 means the step is accepted
+        scale = self.atol + self.rtol * np.maximum(np.abs(state), np.abs(new_state))
+        return np.max(np.abs(error) / scale) if error.size else 0.0
+
+    def step(self, engine, days):
+        # integrate the interval `days` using as many internal steps as the tolerance requires
+        state = np.stack((engine.positions, engine.velocities))
+        remaining = days
+        h = self.h if self.h else days
+        while remaining > 1e-12 * abs(days):
+            if self.max_step:
+                h = min(h, self.max_step)
+            clipped = h >= remaining
+            h_try = min(h, remaining)
+            state, h_taken, h_next = self.attempt(engine, state, h_try)
+            remaining -= h_taken
+            # a step shortened only to land on the end of the interval says nothing about the step size
+            if not clipped or h_taken < h_try:
+                h = h_next
+        self.h = h
+
+        engine.positions[:] = state[0]
+        engine.velocities[:] = state[1]
+
+    def attempt(self, engine, state, h):
+        # try one internal step of size h; returns (new state, step actually taken, proposed next step)
+        raise NotImplementedError
+
+"""
+Adaptive Dormand–Prince RK5(4) with FSAL
+"""
+class RK45(AdaptiveIntegrator):
+    C = (0, 1/5, 3/10, 4/5, 8/9, 1, 1)
+    A = (
+        (),
+        (1/5,),
+        (3/40, 9/40),
+        (44/45, -56/15, 32/9),
+        (19372/6561, -25360/2187, 64448/6561, -212/729),
+        (9017/3168, -355/33, 46732/5247, 49/176, -5103/18656),
+        (35/384, 0, 500/1113, 125/192, -2187/6784, 11/84)
+    )
+    # difference between the 5th and embedded 4th order weights
+    E = (71/57600, 0, -71/16695, 71/1920, -17253/339200, 22/525, -1/40)
+
+    def __init__(self, rtol = 1e-9, atol = 1e-12, max_step = None):
+        super().__init__(rtol, atol, max_step)
+        # derivative at the end of the last accepted step, reused as the first stage of the next one
+        self._fsal_state = None
+        self._fsal = None
+
+    def reset_cache(self):
+        self._fsal_state = None
+
+    def attempt(self, engine, state, h):
+        if self._fsal_state is not None and self._fsal_state.shape == state.shape and np.array_equal(self._fsal_state, state):
+            first = self._fsal
+        else:
+            first = self.derivative(engine, state)
+
+        while True:
+            self.steps += 1
+            k = [first]
+            for a in self.A[1:]:
+                k.append(self.derivative(engine, state + h * sum(a_j * k_j for a_j, k_j in zip(a, k) if a_j)))
+            new_state = state + h * sum(a_j * k_j for a_j, k_j in zip(self.A[6], k) if a_j)
+            error = h * sum(e_j * k_j for e_j, k_j in zip(self.E, k) if e_j)
+
+            norm = self.error_norm(error, state, new_state)
+            factor = 5 if norm == 0 else min(5, max(0.2, 0.9 * norm ** -0.2))
+            if norm <= 1:
+                # the last stage is the derivative at the new state (first same as last)
+                self._fsal_state = new_state
+                self._fsal = k[6]
+                return new_state, h, h * factor
+            h *= factor
+
+"""
+Adaptive Bulirsch–Stoer (modified midpoint + Richardson extrapolation), high order
+"""
+class BulirschStoer(AdaptiveIntegrator):
+    def __init__(self, rtol = 1e-12, atol = 1e-14, max_step = None, max_order = 8):
+        # max_order: maximum number of extrapolation stages (substep sequence 2, 4, 6, ...)
+        super().__init__(rtol, atol, max_step)
+        self.sequence = [2 * (i + 1) for i in range(max_order)]
+
+    def midpoint(self, engine, state, big_h, n):
+        # modified midpoint method across big_h using n substeps
+        h = big_h / n
+        previous = state
+        current = state + h * self.derivative(engine, state)
+        for _ in range(n - 1):
+            previous, current = current, previous + 2 * h * self.derivative(engine, current)
+        return 0.5 * (current + previous + h * self.derivative(engine, current))
+
+    def attempt(self, engine, state, h):
+        while True:
+            self.steps += 1
+            table = []
+            for k, n in enumerate(self.sequence):
+                row = [self.midpoint(engine, state, h, n)]
+                for j in range(1, k + 1):
+                    ratio = (n / self.sequence[k - j]) ** 2 - 1
+                    row.append(row[j - 1] + (row[j - 1] - table[k - 1][j - 1]) / ratio)
+                table.append(row)
+
+                if k:
+                    norm = self.error_norm(row[k] - row[k - 1], state, row[k])
+                    if norm <= 1:
+                        # grow the step when convergence came early, shrink it when it came late
+                        factor = min(4, max(0.5, 0.94 * (0.65 / max(norm, 1e-10)) ** (1 / (2 * k + 1))))
+                        return row[k], h, h * factor
+            h *= 0.25
+
+"""
+Wisdom–Holman mixed-variable symplectic integrator (democratic heliocentric coordinates)
+"""
+class WisdomHolman(Integrator):
+    def __init__(self, central = None):
+        # central: index of the dominant body (default: the most massive one)
+        # every other body is advanced analytically on its Kepler orbit around the central body and
+        # the interactions between them are applied as kicks, so steps of days stay accurate
+        super().__init__()
+        self.central = central
+        self._positions = None
+        self._acc = None
+
+    def reset_cache(self):
+        self._acc = None
+
+    def interaction_accelerations(self, engine, heliocentric, masses):
+        # accelerations due to every non-central body, evaluated in heliocentric coordinates
+        # (test particles, having no mass, are only targets)
+        self.force_evaluations += 1
+        massive = np.flatnonzero(masses)
+        if len(massive) == 0:
+            return np.zeros_like(heliocentric)
+        if len(massive) == len(masses):
+            return engine.G * engine.solver.accelerations(heliocentric, heliocentric, masses)
+        return engine.G * engine.solver.accelerations(heliocentric, heliocentric[massive], masses[massive])
+
+    def step(self, engine, days):
+        from orbitalsim.kepler import kepler_drift
+
+        masses = engine.masses
+        central = self.central if self.central is not None else int(np.argmax(masses))
+        others = np.arange(len(masses)) != central
+        m = masses[others]
+        m_central = masses[central]
+        total = masses.sum()
+        mu = engine.G * m_central
+
+        # inertial -> democratic heliocentric: positions relative to the central body,
+        # velocities relative to the barycentre
+        positions, velocities = engine.positions, engine.velocities
+        barycentre = masses @ positions / total
+        barycentre_velocity = masses @ velocities / total
+        q = positions[others] - positions[central]
+        v = velocities[others] - barycentre_velocity
+
+        # the interaction kick at the end of a step is reused at the start of the next one
+        # (as long as nothing has moved or been added in between)
+        if self._acc is None or self._positions.shape != positions.shape or not np.array_equal(self._positions, positions):
+            self._acc = self.interaction_accelerations(engine, q, m)
+
+        v += 0.5 * days * self._acc
+        q += 0.5 * days * (m @ v) / m_central
+        q, v = kepler_drift(q, v, mu, days)
+        q += 0.5 * days * (m @ v) / m_central
+        self._acc = self.interaction_accelerations(engine, q, m)
+        v += 0.5 * days * self._acc
+
+        # democratic heliocentric -> inertial, the barycentre moving uniformly
+        barycentre += barycentre_velocity * days
+        positions[central] = barycentre - m @ q / total
+        positions[others] = q + positions[central]
+        velocities[central] = barycentre_velocity - m @ v / m_central
+        velocities[others] = v + barycentre_velocity
+        self._positions = positions.copy()
+        self.steps += 1
+
+INTEGRATORS = {
+    'euler': Euler,
+    'leapfrog': Leapfrog,
+    'rk45': RK45,
+    'bulirsch-stoer': BulirschStoer,
+    'wisdom-holman': WisdomHolman
+}
+
+def make_integrator(name, **options):
+    # integrator: 'euler', 'leapfrog' (symplectic), 'rk45' (adaptive), 'bulirsch-stoer' (adaptive, high order)
+    # or 'wisdom-holman' (symplectic Kepler splitting, for systems dominated by one central body)
+    if name not in INTEGRATORS:
+        raise ValueError('Unknown integrator {!r}, expected one of {}'.format(name, tuple(INTEGRATORS)))
+    return INTEGRATORS[name](**options)
@@ -0,0 +1,72 @@
+import numpy as np
+
+"""
+Analytic two-body (Keplerian) propagation using universal variables, vectorised over many bodies
+"""
+
+def stumpff(z):
+    # Stumpff functions C(z) and S(z), with series expansions near z = 0 to avoid cancellation
+    c = np.empty_like(z)
+    s = np.empty_like(z)
+    small = np.abs(z) < 1e-3
+    positive = (z > 0) & ~small
+    negative = (z < 0) & ~small
+
+    zs = z[small]
+    c[small] = 1/2 - zs / 24 + zs ** 2 / 720 - zs ** 3 / 40320
+    s[small] = 1/6 - zs / 120 + zs ** 2 / 5040 - zs ** 3 / 362880
+
+    root = np.sqrt(z[positive])
+    c[positive] = (1 - np.cos(root)) / z[positive]
+    s[positive] = (root - np.sin(root)) / root ** 3
+
+    root = np.sqrt(-z[negative])
+    c[negative] = (np.cosh(root) - 1) / -z[negative]
+    s[negative] = (np.sinh(root) - root) / root ** 3
+    return c, s
+
+def kepler_drift(positions, velocities, mu, dt, tolerance = 1e-14, max_iterations = 50):
+    # advances every (position, velocity) pair along its Kepler orbit around a fixed mass with
+    # gravitational parameter mu (AU^3/day^2) for dt days; handles elliptic and hyperbolic orbits
+    # positions, velocities: (n, 2) arrays relative to the central body, returns new (n, 2) arrays
+    r0 = np.hypot(positions[:, 0], positions[:, 1])
+    v0_sq = np.einsum('ij,ij->i', velocities, velocities)
+    vr0 = np.einsum('ij,ij->i', positions, velocities) / r0
+    sqrt_mu = np.sqrt(mu)
+    # alpha = 1 / a: positive for bound orbits
+    alpha = 2 / r0 - v0_sq / mu
+
+    # bound orbits only need to be propagated for dt modulo their period
+    t = np.full_like(r0, dt)
+    bound = alpha > 0
+    if np.any(bound):
+        period = 2 * np.pi / np.sqrt(mu * alpha[bound] ** 3)
+        t[bound] = np.fmod(t[bound], period)
+
+    # solve the universal Kepler equation for chi with Newton's method
+    chi = sqrt_mu * np.abs(alpha) * t
+    unbound = ~bound
+    chi[unbound] = np.sign(t[unbound]) * np.sqrt(np.abs(1 / np.where(alpha[unbound] != 0, alpha[unbound], 1e-300))) * \
+        np.log1p(np.abs(t[unbound]) * sqrt_mu / np.maximum(r0[unbound], 1e-300))
+    for _ in range(max_iterations):
+        z = alpha * chi ** 2
+        c, s = stumpff(z)
+        chi_sq = chi ** 2
+        r = r0 * vr0 / sqrt_mu * chi_sq * c + (1 - alpha * r0) * chi ** 3 * s + r0 * chi
+        dr = r0 * vr0 / sqrt_mu * chi * (1 - z * s) + (1 - alpha * r0) * chi_sq * c + r0
+        delta = (r - sqrt_mu * t) / dr
+        chi = chi - delta
+        if np.all(np.abs(delta) <= tolerance * np.maximum(np.abs(chi), 1)):
+            break
+
+    # Lagrange coefficients
+    z = alpha * chi ** 2
+    c, s = stumpff(z)
+    f = 1 - chi ** 2 / r0 * c
+    g = t - chi ** 3 / sqrt_mu * s
+    new_positions = f[:, np.newaxis] * positions + g[:, np.newaxis] * velocities
+    r = np.hypot(new_positions[:, 0], new_positions[:, 1])
+    f_dot = sqrt_mu / (r * r0) * (z * chi * s - chi)
+    g_dot = 1 - chi ** 2 / r * c
+    new_velocities = f_dot[:, np.newaxis] * positions + g_dot[:, np.newaxis] * velocities
+    return new_positions, new_velocities
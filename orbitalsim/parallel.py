@@ -0,0 +1,144 @@
+import os
+import weakref
+import multiprocessing
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from orbitalsim.engine import DirectSolver
+
+def _attach(name, shape, handles):
+    # numpy view of a shared memory block, attaching (and caching the handle) on first use
+    if name not in handles:
+        handles[name] = shared_memory.SharedMemory(name = name)
+    return np.ndarray(shape, dtype = np.float64, buffer = handles[name].buf)
+
+def _worker(conn, block_size):
+    # worker process: waits for (buffer names, sizes, target range) messages, evaluates the direct sum
+    # for its range of targets straight from/into shared memory and replies when done
+    solver = DirectSolver(block_size)
+    handles = {}
+    try:
+        while True:
+            message = conn.recv()
+            if message is None:
+                break
+            names, m, n, start, stop, solver.softening = message
+            # blocks that the parent has since replaced (and unlinked) are closed, so their memory is freed
+            for name in [name for name in handles if name not in names]:
+                handles.pop(name).close()
+            targets = _attach(names[0], (m, 2), handles)
+            sources = _attach(names[1], (n, 2), handles)
+            masses = _attach(names[2], (n,), handles)
+            output = _attach(names[3], (m, 2), handles)
+            output[start:stop] = solver.accelerations(targets[start:stop], sources, masses)
+            # drop the views, a handle can't be closed while arrays still use its buffer
+            targets = sources = masses = output = None
+            conn.send(True)
+    finally:
+        for handle in handles.values():
+            handle.close()
+
+def _shutdown(workers, buffers):
+    # stop the worker processes and release the shared memory blocks; takes the solver's containers
+    # rather than the solver, so that the finalizer holding them doesn't keep the solver alive
+    for process, conn in workers:
+        try:
+            conn.send(None)
+            conn.close()
+        except (OSError, ValueError):
+            pass
+        process.join(timeout = 1)
+        if process.is_alive():
+            process.terminate()
+    workers.clear()
+    for block in buffers.values():
+        block.close()
+        block.unlink()
+    buffers.clear()
+
+"""
+Multi-core direct solver – the targets are partitioned across worker processes that read positions
+and masses from shared memory, so no arrays are pickled per step
+"""
+class ParallelSolver():
+    def __init__(self, processes = None, threshold = 2048, block_size = 2 ** 20, softening = 0):
+        # processes: number of worker processes (default: one per CPU)
+        # threshold: below this many bodies the serial DirectSolver is used, as process overhead dominates
+        # block_size: same meaning as for DirectSolver; the targets are split on multiples of the serial
+        #   block length, so every row is computed exactly as the serial solver would and the results match it bit-for-bit
+        # softening: Plummer softening length in AU (see DirectSolver)
+        self.processes = processes or os.cpu_count() or 1
+        self.threshold = threshold
+        self.block_size = block_size
+        self.serial = DirectSolver(block_size, softening)
+
+        self.workers = []
+        self.buffers = {}
+        # workers and blocks are released when the solver is garbage collected or at exit at the latest
+        weakref.finalize(self, _shutdown, self.workers, self.buffers)
+
+    @property
+    def softening(self):
+        return self.serial.softening
+
+    @softening.setter
+    def softening(self, value):
+        self.serial.softening = value
+
+    def start(self):
+        # launch the worker processes (done lazily, on the first evaluation above the threshold)
+        # the resource tracker is started first so that the workers share the parent's instead of starting
+        # their own (which would unlink the blocks when a worker exits); they are started before any block
+        # exists, so no forked worker inherits a mapping of a block it would never close
+        resource_tracker.ensure_running()
+        context = multiprocessing.get_context()
+        for _ in range(self.processes):
+            parent, child = context.Pipe()
+            process = context.Process(target = _worker, args = (child, self.block_size), daemon = True)
+            process.start()
+            child.close()
+            self.workers.append((process, parent))
+
+    def buffer(self, key, size):
+        # shared memory block of at least `size` float64 values, reallocated (with room to grow) when too small
+        current = self.buffers.get(key)
+        if current is None or current.size < 8 * size:
+            if current is not None:
+                current.close()
+                current.unlink()
+            current = shared_memory.SharedMemory(create = True, size = 8 * max(2 * size, 64))
+            self.buffers[key] = current
+        return current
+
+    def accelerations(self, targets, sources, masses):
+        m, n = len(targets), len(sources)
+        if max(m, n) < self.threshold or self.processes < 2:
+            return self.serial.accelerations(targets, sources, masses)
+        if not self.workers:
+            self.start()
+        blocks = [self.buffer(key, size) for key, size in (('targets', 2 * m), ('sources', 2 * n), ('masses', n), ('output', 2 * m))]
+        names = tuple(block.name for block in blocks)
+        np.ndarray((m, 2), dtype = np.float64, buffer = blocks[0].buf)[:] = targets
+        np.ndarray((n, 2), dtype = np.float64, buffer = blocks[1].buf)[:] = sources
+        np.ndarray((n,), dtype = np.float64, buffer = blocks[2].buf)[:] = masses
+
+        # split the targets into contiguous ranges aligned to the serial block length
+        block = max(1, self.block_size // n)
+        n_blocks = -(-m // block)
+        per_worker = -(-n_blocks // len(self.workers))
+        busy = []
+        for i, (_, conn) in enumerate(self.workers):
+            start, stop = i * per_worker * block, min(m, (i + 1) * per_worker * block)
+            if start >= stop:
+                break
+            conn.send((names, m, n, start, stop, self.softening))
+            busy.append(conn)
+        for conn in busy:
+            conn.recv()
+
+        return np.ndarray((m, 2), dtype = np.float64, buffer = blocks[3].buf).copy()
+
+    def close(self):
+        # stop the workers and release the shared memory (they are started again if the solver is used again)
+        _shutdown(self.workers, self.buffers)
@@ -1,5 +1,6 @@
 import logging
 import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from orbitalsim.simulation import Simulation
 
@@ -17,23 +18,51 @@ class Preset(Simulation):
         entity_scale = 5, 
         sim_rate = 3,
         start_date = None,
-        fullscreen = False
+        fullscreen = False,
+        engine = 'python',
+        horizons = False
     ):
-        super().__init__(dimensions, scale, entity_scale, sim_rate, start_date, fullscreen)
+        # horizons: initialise the bodies from JPL Horizons (network, or the Horizons cache) instead of
+        #   the ephemeris bundled with the package, which is instant and offline but less accurate
+        super().__init__(dimensions, scale, entity_scale, sim_rate, start_date, fullscreen, engine)
+        self.use_horizons = horizons
 
-    def add_entities(self, observer_id):
+    def add_entities(self, observer_id, max_workers = 16):
+        # fetches every body's Horizons data concurrently, then adds the entities in the order of
+        # entity_data so that the result is deterministic; without horizons the bodies are computed
+        # locally from the bundled ephemeris
+        # max_workers: bound on the Horizons requests in flight; every body takes two concurrent requests
+        #   (vectors and elements, see query_horizons), so max_workers // 2 bodies are fetched at a time
+        ids = list(self.entity_data.keys())
+        positionings = {}
 
-        for i, id_ in enumerate(self.entity_data.keys()):
+        if not self.use_horizons:
+            for id_ in ids:
+                positionings[id_] = self.get_bundled_positioning(id_, observer_id)
+            self.add_positioned_entities(ids, positionings)
+            return
+
+        with ThreadPoolExecutor(max_workers = max(1, min(max_workers // 2, len(ids)))) as pool:
+            futures = {
+                pool.submit(self.get_horizons_positioning, id_, observer_id): id_
+                for id_ in ids
+            }
+            for i, future in enumerate(as_completed(futures)):
+                positionings[futures[future]] = future.result()
+                logging.info('Fetched entity {} ({} of {})'.format(futures[future], i + 1, len(ids)))
+        self.add_positioned_entities(ids, positionings)
+
+    def add_positioned_entities(self, ids, positionings):
+        for i, id_ in enumerate(ids):
             mass = self.entity_data[id_]['m']
             diameter = self.entity_data[id_]['d']
 
-            self.add_horizons_entity(
-                entity_id = id_,
-                observer_id = observer_id,
+            self.add_positioned_entity(
+                positioning = positionings[id_],
                 mass = mass,
                 diameter = diameter
             )
-            logging.info('Added entity {} of {}'.format(i + 1, len(self.entity_data)))
+            logging.info('Added entity {} of {}'.format(i + 1, len(ids)))
 
 """
 Child classes for each preset
@@ -45,9 +74,11 @@ class InnerSolarSystem(Preset):
         entity_scale = 5, 
         sim_rate = 3,
         start_date = None,
-        fullscreen = False
+        fullscreen = False,
+        engine = 'python',
+        horizons = False
     ):
-        super().__init__(dimensions, scale, entity_scale, sim_rate, start_date, fullscreen)
+        super().__init__(dimensions, scale, entity_scale, sim_rate, start_date, fullscreen, engine, horizons)
 
         self.entity_data = {
             'sun': {
@@ -81,9 +112,11 @@ class SolarSystem(Preset):
         entity_scale = 5, 
         sim_rate = 3,
         start_date = None,
-        fullscreen = False
+        fullscreen = False,
+        engine = 'python',
+        horizons = False
     ):
-        super().__init__(dimensions, scale, entity_scale, sim_rate, start_date, fullscreen)
+        super().__init__(dimensions, scale, entity_scale, sim_rate, start_date, fullscreen, engine, horizons)
 
         self.entity_data = {
             'sun': {
@@ -136,9 +169,11 @@ class EarthMoon(Preset):
         entity_scale = 1, 
         sim_rate = 1,
         start_date = None,
-        fullscreen = False
+        fullscreen = False,
+        engine = 'python',
+        horizons = False
     ):
-        super().__init__(dimensions, scale, entity_scale, sim_rate, start_date, fullscreen)
+        super().__init__(dimensions, scale, entity_scale, sim_rate, start_date, fullscreen, engine, horizons)
 
         self.entity_data = {
             '3': {
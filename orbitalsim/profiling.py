@@ -0,0 +1,77 @@
+import csv
+import json
+import time
+from collections import deque
+
+import numpy as np
+
+# phases timed in every frame of Simulation.start, in the order they happen
+PHASES = ('events', 'physics', 'draw', 'flip')
+
+"""
+Per-frame timings of the simulation loop with rolling statistics
+"""
+class FrameStats():
+    def __init__(self, window = 300):
+        # window: number of most recent frames kept for the rolling statistics and dumps
+        self.frames = deque(maxlen = window)
+        self.total_frames = 0
+        self._current = None
+        self._last = None
+
+    def start_frame(self):
+        self._current = {}
+        self._last = time.perf_counter()
+
+    def lap(self, phase):
+        # attribute the time since the previous lap (or the start of the frame) to phase
+        now = time.perf_counter()
+        self._current[phase] = self._current.get(phase, 0) + (now - self._last) * 1000
+        self._last = now
+
+    def end_frame(self, steps = 0, force_evaluations = 0, bodies = 0):
+        # store the frame: phase times in ms, physics steps and force evaluations taken, number of bodies
+        frame = self._current
+        frame['frame'] = sum(frame.get(phase, 0) for phase in PHASES)
+        frame['steps'] = steps
+        frame['force_evaluations'] = force_evaluations
+        frame['bodies'] = bodies
+        self.frames.append(frame)
+        self.total_frames += 1
+
+    def percentiles(self, key, q = (50, 90, 99)):
+        # rolling percentiles of a phase time (ms) or counter over the window
+        values = [frame.get(key, 0) for frame in self.frames]
+        if not values:
+            return {p: 0.0 for p in q}
+        return dict(zip(q, (float(v) for v in np.percentile(values, q))))
+
+    def summary(self):
+        # {key: {'mean': ..., 'p50': ..., 'p90': ..., 'p99': ...}} for every phase and counter
+        summary = {}
+        for key in PHASES + ('frame', 'steps', 'force_evaluations'):
+            values = [frame.get(key, 0) for frame in self.frames]
+            summary[key] = {'mean': float(np.mean(values)) if values else 0.0}
+            summary[key].update({'p{}'.format(p): v for p, v in self.percentiles(key).items()})
+        return summary
+
+    def hud_lines(self):
+        # short text lines for the on-screen overlay
+        summary = self.summary()
+        lines = ['{:<8} {:6.2f} ms  p99 {:6.2f}'.format(key, summary[key]['p50'], summary[key]['p99']) for key in PHASES + ('frame',)]
+        lines.append('steps {:.0f}  forces {:.0f} /frame'.format(summary['steps']['mean'], summary['force_evaluations']['mean']))
+        return lines
+
+    def dump_csv(self, path):
+        # write the frames in the window as CSV, one row per frame
+        keys = PHASES + ('frame', 'steps', 'force_evaluations', 'bodies')
+        with open(path, 'w', newline = '') as f:
+            writer = csv.writer(f)
+            writer.writerow(keys)
+            for frame in self.frames:
+                writer.writerow([frame.get(key, 0) for key in keys])
+
+    def dump_json(self, path):
+        # write the rolling summary and the frames in the window as JSON
+        with open(path, 'w') as f:
+            json.dump({'summary': self.summary(), 'frames': list(self.frames)}, f, indent = 2)
@@ -0,0 +1,133 @@
+import os
+import json
+import struct
+import numpy as np
+
+"""
+Trajectory files
+
+A trajectory file is an 8-byte magic string, a little-endian uint32 header length, a JSON header
+(padded so the data starts on a 64-byte boundary) and then a flat, append-only array of float64
+records. Every record is one snapshot: [time, x_0, y_0, vx_0, vy_0, x_1, y_1, vx_1, vy_1, ...]
+with time in days, positions in AU and velocities in AU/day.
+"""
+
+MAGIC = b'ORBTRAJ1'
+VERSION = 1
+ALIGNMENT = 64
+
+class TrajectoryWriter():
+    def __init__(self, path, names, masses, diameters, colours = None, metadata = None, chunk_size = 1024):
+        # path: file to create (overwritten if it exists)
+        # names, masses, diameters, colours: per-body information stored in the header for replay
+        # metadata: optional dict of extra JSON-serialisable information (e.g. the start date)
+        # chunk_size: number of snapshots buffered in memory before they are appended to the file,
+        #   so memory stays bounded however long the run is
+        self.path = path
+        self.n_bodies = len(names)
+        self.record_size = 1 + 4 * self.n_bodies
+        self.frames = 0
+
+        header = json.dumps({
+            'version': VERSION,
+            'n_bodies': self.n_bodies,
+            'names': list(names),
+            'masses': [float(m) for m in masses],
+            'diameters': [float(d) for d in diameters],
+            'colours': [list(c) for c in colours] if colours is not None else None,
+            'metadata': metadata or {}
+        }).encode('utf-8')
+        prefix = len(MAGIC) + 4
+        header += b' ' * (-(prefix + len(header)) % ALIGNMENT)
+
+        self.file = open(path, 'wb')
+        self.file.write(MAGIC + struct.pack('<I', len(header)) + header)
+
+        self.buffer = np.empty((chunk_size, self.record_size))
+        self.buffered = 0
+
+    def write(self, time, positions, velocities):
+        # append one snapshot of every body's position and velocity at `time` days
+        if len(positions) != self.n_bodies:
+            raise ValueError('Recorded {} bodies, got a snapshot of {}'.format(self.n_bodies, len(positions)))
+        record = self.buffer[self.buffered]
+        record[0] = time
+        state = record[1:].reshape(self.n_bodies, 4)
+        state[:, :2] = positions
+        state[:, 2:] = velocities
+        self.buffered += 1
+        self.frames += 1
+        if self.buffered == len(self.buffer):
+            self.flush()
+
+    def flush(self):
+        if self.buffered:
+            self.file.write(self.buffer[:self.buffered].astype('<f8', copy = False).tobytes())
+            self.buffered = 0
+        self.file.flush()
+
+    def close(self):
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class TrajectoryReader():
+    def __init__(self, path):
+        # memory-maps the snapshots of a trajectory file, so only the frames that are accessed are read from disk
+        with open(path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError('{} is not an orbitalsim trajectory file'.format(path))
+            header_length, = struct.unpack('<I', f.read(4))
+            self.header = json.loads(f.read(header_length).decode('utf-8'))
+
+        self.path = path
+        self.n_bodies = self.header['n_bodies']
+        self.names = self.header['names']
+        self.masses = self.header['masses']
+        self.diameters = self.header['diameters']
+        self.colours = self.header['colours']
+        self.metadata = self.header['metadata']
+
+        offset = len(MAGIC) + 4 + header_length
+        record_size = 1 + 4 * self.n_bodies
+        # a run that is still being written may end in a partial record, which is ignored
+        frames = (os.path.getsize(path) - offset) // (8 * record_size)
+        if frames:
+            self.data = np.memmap(path, dtype = '<f8', mode = 'r', offset = offset, shape = (frames, record_size))
+        else:
+            self.data = np.empty((0, record_size))
+
+    def __len__(self):
+        return len(self.data)
+
+    @property
+    def times(self):
+        # (frames,) array of snapshot times in days
+        return self.data[:, 0]
+
+    def positions(self, frame):
+        # (n, 2) array of positions in a frame
+        return self.data[frame, 1:].reshape(self.n_bodies, 4)[:, :2]
+
+    def velocities(self, frame):
+        # (n, 2) array of velocities in a frame
+        return self.data[frame, 1:].reshape(self.n_bodies, 4)[:, 2:]
+
+    def positions_at(self, time):
+        # positions at an arbitrary time, linearly interpolated between the neighbouring snapshots
+        # (clamped to the recorded range)
+        times = self.times
+        i = int(np.searchsorted(times, time, side = 'right'))
+        if i <= 0:
+            return self.positions(0)
+        if i >= len(times):
+            return self.positions(len(times) - 1)
+        t0, t1 = times[i - 1], times[i]
+        alpha = (time - t0) / (t1 - t0) if t1 > t0 else 0
+        return self.positions(i - 1) + alpha * (self.positions(i) - self.positions(i - 1))
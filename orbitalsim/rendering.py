@@ -0,0 +1,52 @@
+"""
+Vectorised screen-space helpers for the render loop – every entity is transformed, sized and culled
+in one pass over arrays, so only the bodies that are actually drawn cost any Python per frame
+"""
+
+import numpy as np
+
+def screen_positions(positions, scale, default_scale, dx, dy, offsetx, offsety):
+    # (n, 2) positions in AU -> (n,) integer x and y window coordinates in px
+    # (y is reflected to compensate for pygame's reversed axes)
+    relative_scale = scale / default_scale
+    x = relative_scale * ((scale * positions[:, 0]) + dx) + offsetx
+    y = relative_scale * ((scale * -positions[:, 1]) + dy) + offsety
+    # truncated towards zero like int(), clipped so that far-off bodies don't overflow
+    limit = 2.0 ** 31
+    return np.clip(x, -limit, limit).astype(np.int64), np.clip(y, -limit, limit).astype(np.int64)
+
+def screen_radii(diameters, scale, entity_scale):
+    # (n,) diameters in AU -> (n,) integer radii in px
+    return np.abs(diameters * scale * entity_scale / 2).astype(np.int64)
+
+def visible(x, y, r, width, height):
+    # mask of the bodies whose disc of radius r overlaps the window
+    return (x + r >= 0) & (x - r < width) & (y + r >= 0) & (y - r < height)
+
+def density_image(x, y, colours, width, height, gain = 0.5):
+    # accumulates sub-pixel bodies into an image: every body adds gain * its colour to its pixel,
+    # so sparse bodies show up dim and dense regions saturate
+    # x, y: (n,) pixel coordinates, colours: (n, 3) array
+    # returns (array, (left, top)) with array a (w, h, 3) uint8 image of the bounding box of the
+    # bodies inside the window (indexed [x, y] as pygame.surfarray expects), or (None, None)
+    inside = (x >= 0) & (x < width) & (y >= 0) & (y < height)
+    if not inside.any():
+        return None, None
+    if not inside.all():
+        x, y, colours = x[inside], y[inside], colours[inside]
+
+    left, top = x.min(), y.min()
+    w, h = x.max() - left + 1, y.max() - top + 1
+    pixels = (x - left) * h + (y - top)
+    # the per-pixel sums are only converted for the occupied pixels, so the cost follows the number
+    # of bodies rather than the image size; a field of one colour (the usual case) needs a single count
+    image = np.zeros((w * h, 3), dtype = np.uint8)
+    if (colours == colours[0]).all():
+        counts = np.bincount(pixels, minlength = w * h)
+        image[pixels] = np.minimum(counts[pixels, np.newaxis] * (gain * colours[0].astype(float)), 255)
+    else:
+        occupied = np.flatnonzero(np.bincount(pixels, minlength = w * h))
+        for channel in range(3):
+            total = np.bincount(pixels, weights = colours[:, channel], minlength = w * h)
+            image[occupied, channel] = np.minimum(total[occupied] * gain, 255)
+    return image.reshape(w, h, 3), (int(left), int(top))
@@ -0,0 +1,31 @@
+"""
+Fixed-timestep physics scheduler – decouples the physics step from the frame rate
+"""
+class FixedTimestep():
+    def __init__(self, dt = None, max_substeps = 32):
+        # dt: physics timestep in days (None: chosen by Simulation.start from the sim_rate at launch)
+        # max_substeps: maximum number of physics steps per frame; simulated time beyond
+        #   this budget is dropped (the simulation slows down) rather than taken as larger steps
+        self.dt = dt
+        self.max_substeps = max_substeps
+
+        # accumulator: simulated days owed to the physics but not yet stepped (always < dt after advance)
+        # dropped: total simulated days discarded because the substep budget was exceeded
+        self.accumulator = 0
+        self.dropped = 0
+
+    def advance(self, days):
+        # add the simulated time that passed during a frame and return how many steps of dt to take
+        self.accumulator += days
+        steps = int(self.accumulator // self.dt)
+        if steps > self.max_substeps:
+            self.dropped += (steps - self.max_substeps) * self.dt
+            self.accumulator -= (steps - self.max_substeps) * self.dt
+            steps = self.max_substeps
+        self.accumulator -= steps * self.dt
+        return steps
+
+    @property
+    def alpha(self):
+        # fraction of a step the accumulator holds, used to interpolate the rendered state
+        return min(1, max(0, self.accumulator / self.dt))
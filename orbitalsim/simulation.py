@@ -1,12 +1,17 @@
-import pygame
 import math
 import sys
 import os
 import datetime
-from astroquery.jplhorizons import Horizons
-from astropy.time import Time
+import time
 
+import numpy as np
+
+from orbitalsim import rendering
+from orbitalsim.entities import days_per_update
 from orbitalsim.environment import OrbitalSystem
+from orbitalsim.horizons import get_default_cache, julian_date, query_horizons
+from orbitalsim.scheduler import FixedTimestep
+from orbitalsim.worker import PhysicsWorker, advance_date, capture
 
 class Simulation():
     def __init__(
@@ -16,13 +21,15 @@ class Simulation():
         entity_scale = 10, 
         sim_rate = 3,
         start_date = None,
-        fullscreen = False
+        fullscreen = False,
+        engine = 'python'
     ):
         # dimensions: (width, height) of the window in pixels
         # scale: magnification ratio between AU and displayed pixels (default of -1: automatically calculated by self.set_scale())
         # entity_scale: additional magnification on the entities for visibility purposes
         # sim_rate: how many days pass in the simulation for every real-life second (default of 1 day per second)
         # fullscreen: boolean – if true, automatically overrides dimensions
+        # engine: physics engine used by the OrbitalSystem, 'python' or 'numpy' (vectorised, for large systems)
         self.width, self.height = dimensions
 
         # dx, dy: offset in px as a result of panning with arrow keys
@@ -40,11 +47,52 @@ class Simulation():
         if start_date:
             self.date = datetime.datetime.strptime(start_date, '%Y-%m-%d')
         else:
-            self.date = datetime.datetime.today()
+            # midnight UTC today: the same start epoch (and Horizons cache entries) for every startup on the day
+            today = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo = None)
+            self.date = datetime.datetime.combine(today.date(), datetime.time())
         self.date_accumulator = 0
 
         # initialise the Orbital System object
-        self.solar_system = OrbitalSystem()
+        self.solar_system = OrbitalSystem(engine = engine)
+
+        # cache for JPL Horizons responses, None to always query Horizons directly
+        self.horizons = get_default_cache()
+
+        # physics runs in fixed steps of scheduler.dt days, as many per frame as the sim_rate requires
+        # (up to scheduler.max_substeps); rendering interpolates between the last two physics states
+        self.scheduler = FixedTimestep()
+        self.interpolate = True
+
+        # profiler: FrameStats recording per-frame timings, None when profiling is disabled (see enable_profiling)
+        # show_hud: draw the profiler's statistics below the date
+        self.profiler = None
+        self.show_hud = False
+
+        # label surfaces cached per (text, colour) – entity names never change, so they are rendered once
+        # dirty_rects: only redraw and update the parts of the window that changed instead of flipping it all
+        self.label_cache = {}
+        self.dirty_rects = False
+
+        # density_gain: fraction of its colour each sub-pixel body adds to its pixel, so dense fields saturate
+        self.density_gain = 0.5
+
+        # trails: Trails keeping the recent path of every massive body, None when disabled (see enable_trails)
+        # show_trails: draw the trails (toggled with t)
+        self.trails = None
+        self.show_trails = False
+
+        # replay: TrajectoryReader played back instead of simulating (see replay)
+        # replay_time: current playback time in days since the start of the recording
+        self.replay_reader = None
+        self.replay_time = 0
+
+        # threaded_physics: step the system on a PhysicsWorker thread while this thread renders
+        # (not used during replay); physics: the running PhysicsWorker, if any
+        self.threaded_physics = True
+        self.physics = None
+
+        # headless_run: progress of the current (or checkpointed) run_headless call, None between runs
+        self.headless_run = None
 
         self.fullscreen = fullscreen
         self.show_labels = True
@@ -81,6 +129,25 @@ class Simulation():
 
     def change_sim_rate(self, speed_ratio):
         self.sim_rate *= speed_ratio
+        if self.physics is not None:
+            self.physics.send('sim_rate', self.sim_rate)
+
+    def toggle_pause(self):
+        self.paused = not self.paused
+        if self.physics is not None:
+            self.physics.send('pause', self.paused)
+
+    def quit(self):
+        # stop the physics (finishing its current step), close any recording and the window
+        import pygame
+
+        self.running = False
+        if self.physics is not None:
+            self.physics.stop()
+            self.physics = None
+        self.solar_system.stop_recording()
+        pygame.quit()
+        sys.exit()
 
     """
     Adding entities to simulation
@@ -116,12 +183,18 @@ class Simulation():
             mass = mass, 
             diameter = diameter,
             e = e,
-            a = a
+            a = a,
+            name = name
         )
 
     def add_horizons_entity(self, entity_id, observer_id, mass, diameter = 1e-5):
         # entity_id, observer_id: the numerical ids designated by JPL SSD Horizons
-        x, y, speed, angle, e, a, name = self.get_horizons_positioning(entity_id, observer_id)
+        positioning = self.get_horizons_positioning(entity_id, observer_id)
+        self.add_positioned_entity(positioning, mass, diameter)
+
+    def add_positioned_entity(self, positioning, mass, diameter = 1e-5):
+        # positioning: tuple (x, y, speed, angle, e, a, name) as returned by get_horizons_positioning
+        x, y, speed, angle, e, a, name = positioning
 
         self.solar_system.add_entity(
             position = (x, y), 
@@ -135,25 +208,34 @@ class Simulation():
         )
     
     def get_horizons_positioning(self, entity_id, observer_id):
-        obj = Horizons(
-                id = entity_id, 
-                location = '@{}'.format(observer_id),
-                epochs = Time(self.date).jd,
-                id_type='id'
-            )
-
-        if not entity_id == observer_id:
-            vectors = obj.vectors()
-            elements = obj.elements()
-
+        # responses are served from the on-disk cache when possible (see orbitalsim.horizons)
+        epoch = julian_date(self.date)
+        if self.horizons is not None:
+            data = self.horizons.fetch(entity_id, observer_id, epoch)
+        else:
+            data = query_horizons(entity_id, observer_id, epoch)
+        return self.positioning(data, entity_id == observer_id)
+
+    def get_bundled_positioning(self, entity_id, observer_id):
+        # same as get_horizons_positioning, but computed from the ephemeris bundled with the package
+        # (no network, less accurate; see orbitalsim.ephemeris)
+        from orbitalsim.ephemeris import bundled_state
+
+        data = bundled_state(entity_id, observer_id, julian_date(self.date))
+        return self.positioning(data, entity_id == observer_id)
+
+    def positioning(self, data, central = False):
+        # converts a state dict (as returned by query_horizons) into a positioning tuple
+        # (x, y, speed, angle, e, a, name) for add_positioned_entity
+        name = data['name'].replace('Barycenter ', '')
+        if not central:
             # get the eccentricity (e) and semimajor axis (a) 
-            e = elements['e'].data[0]
-            a = elements['a'].data[0]
-            name = elements['targetname'].data[0].replace('Barycenter ', '')
+            e = data['e']
+            a = data['a']
 
             # get the components of position and velocity from JPL SSD 
-            x, y = vectors['x'], vectors['y']
-            vx, vy = vectors['vx'], vectors['vy']
+            x, y = data['x'], data['y']
+            vx, vy = data['vx'], data['vy']
             speed = math.hypot(vx, vy)
 
             # calculate angle of velocity by finding the tangent to the orbit
@@ -163,32 +245,172 @@ class Simulation():
             return x, y, speed, angle, e, a, name
         else:
             # special case for the central body of a system (e.g. the sun)
-            # obj.elements() does not work for when entity_id and observer_id are the same
-            name = obj.vectors()['targetname'].data[0].replace('Barycenter ', '')
             return 0, 0, 0, 0, 0, 0, name
 
     """
     Simulation functions
     """
 
-    def update_date(self, delta_t):
+    def update_date(self, delta_t, days = None):
         # calculate the number of days past in the simulation since last frame
+        # (or use days, the simulated time actually stepped, if given)
         # update simulation date when accumulator overflows
         # no functional purpose, used for display
-        self.date_accumulator += 1 / ( (1000 / self.sim_rate) / delta_t )
-        if self.date_accumulator >= 1:
-            self.date += datetime.timedelta(days = self.date_accumulator)
-            self.date_accumulator = 0
+        if days is None:
+            days = days_per_update(self.sim_rate, delta_t)
+        self.date, self.date_accumulator = advance_date(self.date, self.date_accumulator, days)
+
+    def run_headless(self, until_date, dt = 1 / 24, callback = None, checkpoint = None, checkpoint_every = 600):
+        # advance the simulation to until_date ('yyyy-mm-dd' or datetime) with a fixed timestep of dt days,
+        # without opening a window – pygame is never imported or initialised
+        # callback: optional function called with the OrbitalSystem after every step
+        # checkpoint: optional path the whole state is saved to (see self.checkpoint) every checkpoint_every
+        #   seconds of real time and when the run completes; after restore(checkpoint), calling run_headless
+        #   again with the same until_date and dt continues the run exactly where the checkpoint left it
+        if isinstance(until_date, str):
+            until_date = datetime.datetime.strptime(until_date, '%Y-%m-%d')
+
+        run = self.headless_run
+        if run is None or run['until_date'] != until_date.isoformat() or run['dt'] != dt:
+            days = (until_date - self.date).total_seconds() / 86400
+            if days < 0:
+                raise ValueError('until_date is before the current simulation date')
+            # steps: number of steps taken so far; start_date, time: the date and system time the run started from
+            run = {
+                'until_date': until_date.isoformat(),
+                'dt': dt,
+                'days': days,
+                'steps': 0,
+                'start_date': self.date.isoformat(),
+                'time': self.solar_system.time
+            }
+            self.headless_run = run
+        start_date = datetime.datetime.fromisoformat(run['start_date'])
+        last_checkpoint = time.perf_counter()
+
+        def step(system):
+            nonlocal last_checkpoint
+            run['steps'] += 1
+            if callback:
+                callback(system)
+            if checkpoint is not None and time.perf_counter() - last_checkpoint >= checkpoint_every:
+                self.date = start_date + datetime.timedelta(days = system.time - run['time'])
+                self.write_checkpoint(checkpoint)
+                last_checkpoint = time.perf_counter()
+
+        self.solar_system.propagate(run['days'], dt, step, skip = run['steps'])
+        self.date = until_date
+        self.headless_run = None
+        if checkpoint is not None:
+            self.write_checkpoint(checkpoint)
+        return self.solar_system
+
+    def checkpoint(self, path):
+        # save the OrbitalSystem together with the simulation's date, view, rate and timestep to path
+        # (written atomically, see orbitalsim.checkpoint); while start() runs the physics on its own
+        # thread, the worker writes the checkpoint between two steps
+        if self.physics is not None and self.physics.is_alive():
+            self.physics.send('checkpoint', path)
+        else:
+            self.write_checkpoint(path)
+
+    def write_checkpoint(self, path, date = None, date_accumulator = None):
+        # date, date_accumulator: the date of the system's state, if not self.date (the physics thread's own)
+        if date is None:
+            date, date_accumulator = self.date, self.date_accumulator
+        self.solar_system.checkpoint(path, metadata = {
+            'date': date.isoformat(),
+            'date_accumulator': date_accumulator,
+            'sim_rate': self.sim_rate,
+            'scale': self.scale,
+            'default_scale': self.default_scale,
+            'entity_scale': self.entity_scale,
+            'dx': self.dx,
+            'dy': self.dy,
+            'scheduler': {
+                'dt': self.scheduler.dt,
+                'max_substeps': self.scheduler.max_substeps,
+                'accumulator': self.scheduler.accumulator,
+                'dropped': self.scheduler.dropped
+            },
+            'headless_run': self.headless_run
+        })
+
+    def restore(self, path):
+        # replace the OrbitalSystem and the simulation's state with those saved in a checkpoint
+        from orbitalsim.checkpoint import load_checkpoint
+
+        self.solar_system, metadata = load_checkpoint(path)
+        self.date = datetime.datetime.fromisoformat(metadata['date'])
+        self.date_accumulator = metadata['date_accumulator']
+        self.sim_rate = metadata['sim_rate']
+        self.scale = metadata['scale']
+        self.default_scale = metadata['default_scale']
+        self.entity_scale = metadata['entity_scale']
+        self.dx, self.dy = metadata['dx'], metadata['dy']
+        scheduler = metadata['scheduler']
+        self.scheduler = FixedTimestep(scheduler['dt'], scheduler['max_substeps'])
+        self.scheduler.accumulator = scheduler['accumulator']
+        self.scheduler.dropped = scheduler['dropped']
+        self.headless_run = metadata['headless_run']
+        return self.solar_system
+
+    def record(self, path, every = 1, chunk_size = 1024):
+        # stream the trajectory of every entity to path while the simulation runs (see OrbitalSystem.record)
+        # the start date is stored in the file so that a replay shows the right dates
+        self.solar_system.record(
+            path,
+            every = every,
+            metadata = {'start_date': self.date.isoformat(), 'time': self.solar_system.time},
+            chunk_size = chunk_size
+        )
+
+    def replay(self, path):
+        # play back a recorded trajectory file without re-simulating
+        # the file is memory-mapped, so long recordings can be scrubbed through ([ and ] keys)
+        from orbitalsim.recording import TrajectoryReader
+
+        reader = TrajectoryReader(path)
+        if not len(reader):
+            raise ValueError('{} contains no snapshots'.format(path))
+
+        self.solar_system = OrbitalSystem()
+        positions = reader.positions(0)
+        for i, name in enumerate(reader.names):
+            x, y = positions[i]
+            self.solar_system.add_entity(
+                diameter = reader.diameters[i],
+                mass = reader.masses[i],
+                position = (float(x), float(y)),
+                a = math.hypot(x, y),
+                name = name
+            )
+            if reader.colours:
+                self.solar_system.entities[-1].colour = tuple(reader.colours[i])
+
+        metadata = reader.metadata
+        if 'start_date' in metadata:
+            self.date = datetime.datetime.fromisoformat(metadata['start_date']) - datetime.timedelta(days = metadata.get('time', 0))
+        self.replay_start_date = self.date
+        self.replay_reader = reader
+        self.seek(reader.times[0])
+        self.start()
+
+    def seek(self, time):
+        # move the replay to `time` days (clamped to the recording) and update the displayed date
+        times = self.replay_reader.times
+        self.replay_time = min(max(time, times[0]), times[-1])
+        self.date = self.replay_start_date + datetime.timedelta(days = float(self.replay_time))
 
     def handle_event(self, event):
+        import pygame
+
         if event.type == pygame.QUIT:
-            self.running = False
-            pygame.quit()
-            sys.exit()
+            self.quit()
         if event.type == pygame.KEYDOWN:
             # pause simulation using spacebar
             if event.key == pygame.K_SPACE:
-                self.paused = not self.paused
+                self.toggle_pause()
             elif event.key == pygame.K_LEFT:
                 self.scroll(dx = 30)
             elif event.key == pygame.K_RIGHT:
@@ -209,10 +431,55 @@ class Simulation():
                 self.change_sim_rate(0.5)
             elif event.key == pygame.K_l:
                 self.show_labels = not self.show_labels
+            elif event.key == pygame.K_p and self.profiler is not None:
+                self.show_hud = not self.show_hud
+            elif event.key == pygame.K_t and self.trails is not None:
+                self.show_trails = not self.show_trails
+            elif event.key in (pygame.K_LEFTBRACKET, pygame.K_RIGHTBRACKET) and self.replay_reader is not None:
+                # scrubbing jumps, so the trails start over
+                direction = -1 if event.key == pygame.K_LEFTBRACKET else 1
+                self.seek(self.replay_time + direction * 10 * self.sim_rate)
+                if self.trails is not None:
+                    self.trails.reset()
             elif event.key == pygame.K_q:
-                self.running = False
-                pygame.quit()
-                sys.exit()
+                self.quit()
+
+    def enable_profiling(self, window = 300, hud = True):
+        # start recording per-frame timings of event handling, physics, drawing and display flipping;
+        # returns the FrameStats object (also available as self.profiler)
+        from orbitalsim.profiling import FrameStats
+
+        self.profiler = FrameStats(window)
+        self.show_hud = hud
+        return self.profiler
+
+    def enable_trails(self, length = 256, tolerance = 0.02, show = True):
+        # keep the recent path of every massive body, at most `length` points each, adding a point
+        # whenever the path turns by more than `tolerance` radians; returns the Trails object
+        # (also available as self.trails)
+        from orbitalsim.trails import Trails
+
+        self.trails = Trails(length, tolerance)
+        self.show_trails = show
+        return self.trails
+
+    def force_evaluations(self):
+        # running count of force evaluations, if the engine keeps one
+        integrator = self.solar_system.integrator
+        return integrator.force_evaluations if integrator is not None and self.solar_system.engine_name == 'numpy' else 0
+
+    def named_entities(self, names):
+        # returns (names, indices of the entities with a name, index of the sun or None)
+        named = np.array([i for i, name in enumerate(names) if name], dtype = np.int64)
+        sun = names.index('Sun (10)') if 'Sun (10)' in names else None
+        return names, named, sun
+
+    def render_label(self, font, text, colour):
+        # returns the cached surface for text in colour, rendering it on first use
+        key = (text, colour)
+        if key not in self.label_cache:
+            self.label_cache[key] = font.render(text, False, colour)
+        return self.label_cache[key]
 
     """
     Main simulation function
@@ -220,6 +487,9 @@ class Simulation():
 
     def start(self):
 
+        # pygame is only imported once a window is actually needed (see run_headless)
+        import pygame
+
         """ 
         Setup 
         """
@@ -239,68 +509,185 @@ class Simulation():
         pygame.display.set_caption('Orbital Simulation')
         delta_t = 16
 
-        # pass the sim_rate to each entity in the simulation;
+        # pass the sim_rate to the system (entities don't keep their own copy);
         # also calculate the largest semi-major axis and calculates scale if applicable
+        self.solar_system.sim_rate = self.sim_rate
         semimajor_axes = []
         for entity in self.solar_system.entities:
-            entity.sim_rate = self.sim_rate
             semimajor_axes.append(entity.a)
+            if entity.name == 'Sun (10)':
+                entity.colour = (243, 145, 50)
         try:
             self.set_scale(max(semimajor_axes))
         except ValueError:
             self.set_scale(1)
 
+        # default physics timestep: one step per 60 fps frame at the initial sim_rate
+        if self.scheduler.dt is None:
+            self.scheduler.dt = self.sim_rate * 16 / 1000
+
         font_dir = '{}/fonts/Inconsolata.ttf'.format(os.path.dirname(__file__))
         font = pygame.font.Font(font_dir, 14)
         clock = pygame.time.Clock()
         self.running = True
+
+        # snapshot: state rendered in the frame, with the positions before and after the last step
+        # (interpolated between when rendering); published by the physics thread if there is one
+        snapshot = capture(self.solar_system)
+        if self.threaded_physics and self.replay_reader is None:
+            self.physics = PhysicsWorker(self)
+            self.physics.start()
+        last_steps = 0
+
+        # rendered date text and its surface; areas drawn in the previous frame (dirty rects)
+        date_cache = (None, None)
+        self.window.fill(self.solar_system.bg)
+        pygame.display.flip()
+        dirty = []
+        hud_cache = None
+        # names of the entities, indices of the named ones and the sun's index, refreshed when entities are added or removed
+        named_cache = self.named_entities(snapshot.names)
+        # last snapshot added to the trails (snapshots are immutable, so a new state is a new object)
+        trail_snapshot = None
         
 
         """
         Simulation loop
         """
         while self.running:
+            profiler = self.profiler
+            steps = 0
+            if profiler:
+                profiler.start_frame()
+                force_evaluations = self.force_evaluations()
+
             # handle events
             for event in pygame.event.get():
                 self.handle_event(event)
+            if profiler:
+                profiler.lap('events')
             
             # update frame
-            if not self.paused:
-                self.solar_system.update(delta_t)
-                self.update_date(delta_t)
+            alpha = 1
+            if self.replay_reader is not None:
+                # playback: read the recorded state instead of simulating
+                if not self.paused:
+                    self.seek(self.replay_time + days_per_update(self.sim_rate, delta_t))
+                positions = self.replay_reader.positions_at(self.replay_time)
+                snapshot = snapshot._replace(positions = positions, previous_positions = positions)
+            elif self.physics is not None:
+                # pick up the latest state published by the physics thread (never waits for it);
+                # interpolate by the simulated time that has passed since it was published
+                self.physics.check()
+                snapshot = self.physics.front
+                steps, last_steps = snapshot.steps - last_steps, snapshot.steps
+                self.date, self.date_accumulator = snapshot.date, snapshot.date_accumulator
+                if not self.paused:
+                    alpha = (snapshot.accumulator + (time.perf_counter() - snapshot.published) * self.sim_rate) / self.scheduler.dt
+            else:
+                if not self.paused:
+                    # convert the frame time into simulated days and take whole physics steps of scheduler.dt
+                    self.solar_system.sim_rate = self.sim_rate
+                    steps = self.scheduler.advance(days_per_update(self.sim_rate, delta_t))
+                    previous_positions = None
+                    for i in range(steps):
+                        if i == steps - 1:
+                            previous_positions = self.solar_system.positions()
+                        self.solar_system.step(self.scheduler.dt)
+                    if steps:
+                        snapshot = capture(self.solar_system, previous_positions)
+                    self.update_date(delta_t, days = steps * self.scheduler.dt)
+                alpha = self.scheduler.alpha
+
+            if self.interpolate:
+                alpha = min(1, max(0, alpha))
+                render_positions = snapshot.previous_positions + alpha * (snapshot.positions - snapshot.previous_positions)
+            else:
+                render_positions = snapshot.positions
+            if self.trails is not None and snapshot is not trail_snapshot:
+                self.trails.update(snapshot.positions, snapshot.masses)
+                trail_snapshot = snapshot
+            if profiler:
+                profiler.lap('physics')
 
             # render frame
-            self.window.fill(self.solar_system.bg)
-            date_display = font.render(self.date.strftime("%d %b %Y, %H:%M"), False, (200, 200, 200))
-            self.window.blit(date_display, (0, 0))
-
-            entity_labels = []
-            for entity in self.solar_system.entities:
-                entity.sim_rate = self.sim_rate
-                # calculate pygame x, y coords 
-                # this zooming stuff/scale is super sketchy yikes
-                relative_scale = self.scale / self.default_scale
-                x = int(relative_scale * ((self.scale * entity.x) + self.dx) + self.offsetx)
-                y = int(relative_scale * ((self.scale * -entity.y) + self.dy) + self.offsety) # reflected across y-axis to compensate for pygame's reversed axes
-                r = abs(int(entity.diameter * self.scale * self.entity_scale / 2 ))
-
-                # additional stuff to make entities look nicer at large distances
-                if r < 1 and self.scale > 300:
-                    r = 2
-                if entity.name == 'Sun (10)':
-                    entity.colour = (243, 145, 50)
-                    if r < 2:
-                        r = 2
-
-                pygame.draw.circle(self.window, entity.colour, (x, y), r, 0)
-
-                label = font.render(entity.name, False, (180, 180, 180))
-                entity_labels.append((label, (x + 3 + r, y + 3 + r)))
+            # with dirty rects only the areas drawn last frame are cleared and pushed to the display
+            if self.dirty_rects:
+                for rect in dirty:
+                    self.window.fill(self.solar_system.bg, rect)
+            else:
+                self.window.fill(self.solar_system.bg)
+            drawn = []
+
+            # the date is only re-rendered when the displayed minute changes
+            date_text = self.date.strftime("%d %b %Y, %H:%M")
+            if date_text != date_cache[0]:
+                date_cache = (date_text, font.render(date_text, False, (200, 200, 200)))
+            drawn.append(self.window.blit(date_cache[1], (0, 0)))
+
+            # transform, size and cull every entity in one vectorised pass
+            if len(named_cache[0]) != len(snapshot.names):
+                named_cache = self.named_entities(snapshot.names)
+            names, named, sun = named_cache
+            x, y = rendering.screen_positions(render_positions, self.scale, self.default_scale, self.dx, self.dy, self.offsetx, self.offsety)
+            r = rendering.screen_radii(snapshot.diameters, self.scale, self.entity_scale)
+
+            # additional stuff to make entities look nicer at large distances
+            # (massive bodies only, test particles are always drawn as points)
+            if self.scale > 300:
+                r[(r < 1) & (snapshot.masses > 0)] = 2
+            if sun is not None and r[sun] < 2:
+                r[sun] = 2
+
+            shown = rendering.visible(x, y, r, self.width, self.height)
+            colours = snapshot.colours
+
+            # trails go under the bodies
+            if self.trails is not None and self.show_trails:
+                drawn.extend(self.trails.draw(
+                    self.window, render_positions, colours,
+                    self.scale, self.default_scale, self.dx, self.dy, self.offsetx, self.offsety
+                ))
+
+            # bodies of at least a pixel are drawn as circles
+            discs = np.flatnonzero(shown & (r >= 1))
+            for i, disc_x, disc_y, disc_r in zip(discs.tolist(), x[discs].tolist(), y[discs].tolist(), r[discs].tolist()):
+                drawn.append(pygame.draw.circle(self.window, colours[i].tolist(), (disc_x, disc_y), disc_r, 0))
+
+            # sub-pixel bodies are accumulated into a density image and added onto the frame in one blit
+            points = shown & (r < 1)
+            if points.any():
+                image, corner = rendering.density_image(x[points], y[points], colours[points], self.width, self.height, self.density_gain)
+                if image is not None:
+                    drawn.append(self.window.blit(pygame.surfarray.make_surface(image), corner, special_flags = pygame.BLEND_ADD))
 
             if self.show_labels:
-                for label in entity_labels:
-                    text, position = label
-                    self.window.blit(text, position)
-
-            pygame.display.flip()
+                for i in named[shown[named]].tolist():
+                    label = self.render_label(font, names[i], (180, 180, 180))
+                    drawn.append(self.window.blit(label, (x[i] + 3 + r[i], y[i] + 3 + r[i])))
+
+            # performance overlay, refreshed a few times per second
+            if profiler and self.show_hud:
+                if profiler.total_frames % 15 == 0 or hud_cache is None:
+                    hud_cache = [font.render(line, False, (150, 200, 150)) for line in profiler.hud_lines()]
+                for i, line in enumerate(hud_cache):
+                    drawn.append(self.window.blit(line, (0, 18 + 16 * i)))
+            if profiler:
+                profiler.lap('draw')
+
+            if self.dirty_rects:
+                pygame.display.update(dirty + drawn)
+                dirty = drawn
+            else:
+                pygame.display.flip()
+            if profiler:
+                profiler.lap('flip')
+                profiler.end_frame(steps, self.force_evaluations() - force_evaluations, len(self.solar_system.entities))
             delta_t = clock.tick(60)
+
+        # the loop was left without quitting (running set to False): stop the physics thread
+        # and take the date of its last state
+        if self.physics is not None:
+            self.physics.stop()
+            self.date, self.date_accumulator = self.physics.front.date, self.physics.front.date_accumulator
+            self.physics = None
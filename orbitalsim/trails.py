@@ -0,0 +1,124 @@
+import numpy as np
+
+"""
+Orbit trails – the recent path of every massive body, kept in a fixed-size ring buffer
+
+Positions are stored in AU, independent of the view. A new point is only stored once the path
+has turned by more than `tolerance` radians since the last stored point, so straight stretches
+cost nothing and curved ones get as many points as they need. Each body holds at most `length`
+points however long the run is, and the buffers are allocated once.
+
+The ring is stored twice over (slot i is also written to slot i + length), so a body's points are
+always one contiguous slice in order and can be drawn with a single pygame.draw.lines call.
+"""
+class Trails():
+    def __init__(self, length = 256, tolerance = 0.02):
+        # length: maximum number of points kept per body
+        # tolerance: turn in radians after which the path gets a new point
+        self.length = length
+        self.tolerance = tolerance
+
+        # bodies: indices of the tracked bodies in the system; n: number of bodies in the system
+        # points: (bodies, 2 * length, 2) ring buffer in AU, screen: the same in px (filled by draw)
+        # written: total number of points stored per body; pending: latest position, not yet stored
+        # direction: unit vector from the last stored point to the first position after it (0: not set)
+        self.bodies = np.zeros(0, dtype = np.int64)
+        self.n = None
+        self.points = np.zeros((0, 2 * length, 2))
+        self.screen = np.zeros((0, 2 * length, 2))
+        self.written = np.zeros(0, dtype = np.int64)
+        self.pending = np.zeros((0, 2))
+        self.direction = np.zeros((0, 2))
+
+    def reset(self, masses = None):
+        # forget every trail; with masses, start tracking the massive bodies among them
+        if masses is not None:
+            self.n = len(masses)
+            self.bodies = np.flatnonzero(masses)
+            count = len(self.bodies)
+            if len(self.points) != count:
+                self.points = np.zeros((count, 2 * self.length, 2))
+                self.screen = np.zeros((count, 2 * self.length, 2))
+                self.written = np.zeros(count, dtype = np.int64)
+                self.pending = np.zeros((count, 2))
+                self.direction = np.zeros((count, 2))
+        self.written[:] = 0
+        self.direction[:] = 0
+
+    def memory_usage(self):
+        # bytes held by the buffers, fixed once the tracked bodies are known
+        return sum(array.nbytes for array in (self.points, self.screen, self.written, self.pending, self.direction))
+
+    def store(self, rows, positions):
+        # append positions to the rings of the given rows (both copies of the slot)
+        slots = self.written[rows] % self.length
+        self.points[rows, slots] = positions
+        self.points[rows, slots + self.length] = positions
+        self.written[rows] += 1
+
+    def update(self, positions, masses):
+        # add the latest physics positions of every body in the system; the trails start over when
+        # bodies are added or removed (the indices no longer match)
+        if self.n != len(masses):
+            self.reset(masses)
+        current = positions[self.bodies]
+
+        # first position of a body: it becomes the first point
+        new = self.written == 0
+        if new.any():
+            rows = np.flatnonzero(new)
+            self.store(rows, current[rows])
+            self.pending[rows] = current[rows]
+
+        # the path has turned once the latest position leaves the cone of half-angle tolerance around
+        # the direction the path took from the last stored point; the previous position is then stored
+        last = self.points[np.arange(len(self.bodies)), (self.written - 1) % self.length]
+        offset = current - last
+        distance = np.hypot(offset[:, 0], offset[:, 1])
+        direction = self.direction
+        cross = direction[:, 0] * offset[:, 1] - direction[:, 1] * offset[:, 0]
+        dot = direction[:, 0] * offset[:, 0] + direction[:, 1] * offset[:, 1]
+        started = direction.any(axis = 1)
+        turned = started & ((np.abs(cross) > self.tolerance * distance) | (dot < 0))
+
+        if turned.any():
+            rows = np.flatnonzero(turned)
+            self.store(rows, self.pending[rows])
+            offset[rows] = current[rows] - self.pending[rows]
+            distance[rows] = np.hypot(offset[rows, 0], offset[rows, 1])
+            started[rows] = False
+
+        # the first movement after a stored point sets the direction of the next segment
+        unset = ~started & (distance > 0)
+        direction[unset] = offset[unset] / distance[unset, np.newaxis]
+        direction[~started & (distance == 0)] = 0
+        self.pending[:] = current
+
+    def draw(self, surface, render_positions, colours, scale, default_scale, dx, dy, offsetx, offsety):
+        # draw every trail ending at the body's rendered position, one pygame.draw.lines call per body;
+        # colours: (n, 3) colours of every body in the system (trails are drawn at half brightness)
+        # returns the list of rects drawn (for dirty rects)
+        import pygame
+
+        if not len(self.bodies) or self.n != len(render_positions):
+            return []
+        rows = np.arange(len(self.bodies))
+        count = np.minimum(self.written, self.length)
+        start = (self.written - count) % self.length
+
+        # the slot after a body's points is free (it is the second copy of the oldest slot, or unused),
+        # so the rendered position is put there and the trail reaches the body
+        self.points[rows, start + count] = render_positions[self.bodies]
+
+        # AU -> px for every buffer at once, into the preallocated screen buffer (see rendering.screen_positions)
+        relative_scale = scale / default_scale
+        factor = relative_scale * scale
+        np.multiply(self.points, (factor, -factor), out = self.screen)
+        np.add(self.screen, (relative_scale * dx + offsetx, relative_scale * dy + offsety), out = self.screen)
+
+        drawn = []
+        trail_colours = (colours[self.bodies] // 2).tolist()
+        for row, first, points in zip(rows.tolist(), start.tolist(), (count + 1).tolist()):
+            if points >= 2:
+                drawn.append(pygame.draw.lines(surface, trail_colours[row], False, self.screen[row, first:first + points]))
+        return drawn
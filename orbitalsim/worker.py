@@ -0,0 +1,140 @@
+import queue
+import datetime
+import threading
+import time
+from collections import namedtuple
+
+# state of the system published by the physics for the renderer: every field is a fresh copy,
+# so a snapshot is never modified once published
+# previous_positions: positions one physics step before `positions` (the same array if bodies were added or removed)
+# accumulator: simulated days owed to the physics when the snapshot was taken, published: time.perf_counter() at that moment
+# date, date_accumulator: the displayed date of the state and the days not yet added to it (see advance_date),
+#   set when the snapshot is published by a PhysicsWorker (None otherwise)
+Snapshot = namedtuple('Snapshot', (
+    'time', 'steps', 'positions', 'previous_positions', 'masses', 'diameters', 'colours', 'names',
+    'accumulator', 'published', 'date', 'date_accumulator'
+))
+
+def advance_date(date, date_accumulator, days):
+    # returns (date, date_accumulator) after `days` of simulated time: the days are accumulated and
+    # the date only moves once at least a day has built up (the date is for display only)
+    date_accumulator += days
+    if date_accumulator >= 1:
+        date += datetime.timedelta(days = date_accumulator)
+        date_accumulator = 0
+    return date, date_accumulator
+
+def capture(system, previous_positions = None, steps = 0, accumulator = 0, date = None, date_accumulator = None):
+    # takes a Snapshot of an OrbitalSystem
+    positions = system.positions()
+    if previous_positions is None or len(previous_positions) != len(positions):
+        previous_positions = positions
+    return Snapshot(
+        time = system.time,
+        steps = steps,
+        positions = positions,
+        previous_positions = previous_positions,
+        masses = system.masses(),
+        diameters = system.diameters(),
+        colours = system.colours(),
+        names = system.names(),
+        accumulator = accumulator,
+        published = time.perf_counter(),
+        date = date,
+        date_accumulator = date_accumulator
+    )
+
+"""
+Physics worker – steps a Simulation's OrbitalSystem in real time on its own thread
+"""
+class PhysicsWorker(threading.Thread):
+    def __init__(self, simulation):
+        # simulation: the Simulation whose solar_system, scheduler, sim_rate, paused state and date are used
+        # the render loop reads `front`, the last published Snapshot, without locking: snapshots are
+        # built off to the side (the back buffer) and published by swapping a single reference;
+        # it controls the worker only through commands (see send), never by touching the system;
+        # the worker keeps its own copy of the date and publishes it with every snapshot, the render
+        # loop takes the displayed date from there
+        super().__init__(name = 'orbitalsim-physics', daemon = True)
+        self.simulation = simulation
+        self.system = simulation.solar_system
+        self.scheduler = simulation.scheduler
+        self.sim_rate = simulation.sim_rate
+        self.paused = simulation.paused
+        self.date = simulation.date
+        self.date_accumulator = simulation.date_accumulator
+
+        # steps: total number of physics steps taken
+        # error: exception raised by the physics, re-raised in the render loop (see check)
+        self.commands = queue.Queue()
+        self.steps = 0
+        self.error = None
+        self.front = capture(self.system, date = self.date, date_accumulator = self.date_accumulator)
+
+    def send(self, command, value = None):
+        # command: 'pause' (value: bool), 'sim_rate' (value: days per second),
+        # 'checkpoint' (value: path, see Simulation.checkpoint) or 'quit'
+        self.commands.put((command, value))
+
+    def check(self):
+        # re-raise an exception from the physics thread in the calling thread
+        if self.error is not None:
+            raise self.error
+
+    def stop(self, timeout = None):
+        # ask the worker to quit after its current step and wait for it
+        self.send('quit')
+        self.join(timeout)
+
+    def run(self):
+        try:
+            self.loop()
+        except Exception as error:
+            self.error = error
+
+    def loop(self):
+        last = time.perf_counter()
+        wait = 0
+        while True:
+            # handle commands: block while paused, otherwise wait at most until the next step is due
+            paused = self.paused
+            try:
+                command, value = self.commands.get(timeout = None if paused else wait)
+                while True:
+                    if command == 'quit':
+                        return
+                    if command == 'pause':
+                        self.paused = value
+                    elif command == 'sim_rate':
+                        self.sim_rate = value
+                        self.system.sim_rate = value
+                    elif command == 'checkpoint':
+                        self.simulation.write_checkpoint(value, self.date, self.date_accumulator)
+                    command, value = self.commands.get_nowait()
+            except queue.Empty:
+                pass
+            now = time.perf_counter()
+            if paused:
+                # don't catch up on the time spent paused
+                last = now
+            if self.paused:
+                continue
+
+            # convert the elapsed real time into simulated days and take whole physics steps of scheduler.dt
+            steps = self.scheduler.advance((now - last) * self.sim_rate)
+            last = now
+            previous_positions = None
+            for i in range(steps):
+                if i == steps - 1:
+                    previous_positions = self.system.positions()
+                self.system.step(self.scheduler.dt)
+            if steps:
+                self.steps += steps
+                self.date, self.date_accumulator = advance_date(self.date, self.date_accumulator, steps * self.scheduler.dt)
+                self.front = capture(
+                    self.system, previous_positions, self.steps, self.scheduler.accumulator,
+                    self.date, self.date_accumulator
+                )
+
+            # real time until the next step is due
+            wait = max(0, (self.scheduler.dt - self.scheduler.accumulator) / self.sim_rate)
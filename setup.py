@@ -24,6 +24,6 @@ setup(
     ],
     packages=find_packages(),
     include_package_data=True,
-    install_requires=["pygame", "astropy", "astroquery"],
+    install_requires=["pygame", "numpy", "astropy", "astroquery"],
     download_url="https://github.com/jasonfyw/orbital-sim/archive/v0.9.2.tar.gz"
 )
\ No newline at end of file
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from orbitalsim.checkpoint import load_checkpoint
+from orbitalsim.environment import OrbitalSystem
+from orbitalsim.integrators import INTEGRATORS
+
+def make_system(engine, integrator = None):
+    system = OrbitalSystem(engine = engine)
+    if integrator is not None:
+        system.set_integrator(integrator)
+    system.add_entity(diameter = 0.01, mass = 1.989e30, position = (0, 0), name = 'Sun')
+    system.add_entity(diameter = 1e-4, mass = 6e24, position = (1, 0), speed = 0.0172, angle = 0, name = 'Earth')
+    system.add_entity(diameter = 1e-3, mass = 1.9e27, position = (0, 5.2), speed = 0.0075, angle = np.pi / 2, name = 'Jupiter')
+    system.add_entity(diameter = 1e-5, mass = 0, position = (-2.5, 0), speed = 0.0109, angle = np.pi)
+    system.set_collisions('flag', encounter_distance = 0.01, log = False)
+    return system
+
+def state(system):
+    return system.time, system.positions(), system.velocities(), system.masses(), system.names()
+
+def assert_same_state(a, b):
+    assert a[0] == b[0]
+    for x, y in zip(a[1:4], b[1:4]):
+        np.testing.assert_array_equal(x, y)
+    assert a[4] == b[4]
+
+@pytest.mark.parametrize('engine, integrator', [('python', None)] + [('numpy', name) for name in INTEGRATORS])
+def test_resume_matches_uninterrupted_run(tmp_path, engine, integrator):
+    path = str(tmp_path / 'run.ckpt')
+    uninterrupted = make_system(engine, integrator)
+    uninterrupted.propagate(20, dt = 0.5)
+    uninterrupted.checkpoint(path)
+    uninterrupted.propagate(20, dt = 0.5)
+
+    resumed, _ = load_checkpoint(path)
+    resumed.propagate(20, dt = 0.5)
+    assert_same_state(state(resumed), state(uninterrupted))
+
+def test_metadata_round_trip(tmp_path):
+    path = str(tmp_path / 'run.ckpt')
+    system = make_system('numpy')
+    system.checkpoint(path, metadata = {'date': '2020-01-01T00:00:00'})
+    restored, metadata = load_checkpoint(path)
+    assert metadata == {'date': '2020-01-01T00:00:00'}
+    assert_same_state(state(restored), state(system))
+    assert restored.ids().tolist() == system.ids().tolist()
@@ -0,0 +1,33 @@
+import pytest
+
+from orbitalsim.environment import OrbitalSystem
+
+@pytest.mark.parametrize('engine', ['python', 'numpy'])
+def test_merge_keeps_encounters_of_unnamed_bodies(engine):
+    # a merge removes a body and shifts the indices of the ones after it; the close pair of unnamed
+    # bodies behind it must neither be reported again nor be mistaken for another pair
+    system = OrbitalSystem(engine = engine)
+    system.add_entity(diameter = 0.1, mass = 1e20, position = (0, 0))
+    system.add_entity(diameter = 0.1, mass = 1e10, position = (0.05, 0))
+    system.add_entity(diameter = 0.01, mass = 1e10, position = (5, 0))
+    system.add_entity(diameter = 0.01, mass = 1e10, position = (5.1, 0))
+    system.set_collisions('merge', encounter_distance = 0.2, log = False)
+
+    system.collisions.check(system)
+    kinds = [event['kind'] for event in system.collisions.events]
+    assert sorted(kinds) == ['collision', 'encounter']
+    assert len(system.entities) == 3
+    assert [entity.uid for entity in system.entities] == [0, 2, 3]
+
+    system.collisions.check(system)
+    assert len(system.collisions.events) == 2
+    assert system.collisions._close == {(2, 3)}
+
+def test_uids_survive_engine_switch():
+    system = OrbitalSystem()
+    system.add_entity(diameter = 0.1, mass = 1e20, position = (0, 0))
+    system.add_particles([(1, 0), (2, 0)])
+    system.set_engine('numpy')
+    assert system.ids().tolist() == [0, 1, 2]
+    system.add_entity(diameter = 0.1, mass = 1, position = (3, 0))
+    assert system.ids().tolist() == [0, 1, 2, 3]
@@ -0,0 +1,31 @@
+import numpy as np
+
+from orbitalsim.ensemble import Ensemble
+from orbitalsim.environment import OrbitalSystem
+
+def test_energy_is_independent_of_block_size():
+    system = OrbitalSystem(engine = 'numpy')
+    rng = np.random.default_rng(1)
+    for i in range(13):
+        system.add_entity(diameter = 0.01, mass = float(rng.uniform(1e20, 1e30)), position = tuple(rng.uniform(-5, 5, 2)), speed = 0.01, angle = i)
+    ensemble = Ensemble(system, 5, mass_sigma = 0.01, position_sigma = 0.01, seed = 2)
+    expected = ensemble.energy()
+    # blocks of a few copies, of one copy and of a few rows of one copy
+    for block_size in (500, 169, 40, 1):
+        ensemble.block_size = block_size
+        np.testing.assert_allclose(ensemble.energy(), expected, rtol = 1e-14)
+
+def test_accelerations_are_independent_of_block_size():
+    system = OrbitalSystem(engine = 'numpy')
+    rng = np.random.default_rng(3)
+    for position in rng.uniform(-5, 5, (9, 2)):
+        system.add_entity(diameter = 0.01, mass = float(rng.uniform(1e20, 1e30)), position = tuple(position))
+    system.add_particles(rng.uniform(-5, 5, (4, 2)))
+    ensemble = Ensemble(system, 3, mass_sigma = 0.01, position_sigma = 0.01, seed = 4)
+    expected = ensemble.accelerations()
+    closest = ensemble.min_separation.copy()
+    for block_size in (100, 9, 1):
+        ensemble.block_size = block_size
+        ensemble.min_separation[:] = np.inf
+        np.testing.assert_allclose(ensemble.accelerations(), expected, rtol = 1e-13)
+        np.testing.assert_array_equal(ensemble.min_separation, closest)
@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+from orbitalsim.environment import OrbitalSystem
+
+@pytest.mark.parametrize('engine', ['python', 'numpy'])
+def test_angle_of_body_at_rest_is_kept(engine):
+    system = OrbitalSystem(engine = engine)
+    system.add_entity(diameter = 0.01, mass = 1, position = (1, 0), speed = 0, angle = 1.0)
+    entity = system.entities[0]
+    assert entity.angle == 1.0
+
+    entity.angle = 2.0
+    entity.speed = 0.5
+    assert entity.angle == pytest.approx(2.0)
+    assert entity.speed == pytest.approx(0.5)
+
+def test_angle_of_body_at_rest_survives_engine_switch():
+    system = OrbitalSystem()
+    system.add_entity(diameter = 0.01, mass = 1, position = (1, 0), speed = 0, angle = 1.0)
+    system.set_engine('numpy')
+    assert system.entities[0].angle == 1.0
+
+@pytest.mark.parametrize('softening', [0, 0.05])
+def test_softened_field_matches_between_engines(softening):
+    # one step of a particle close to the sun: both engines apply G * m * r / (r^2 + softening^2)^1.5
+    velocities = []
+    for engine in ('python', 'numpy'):
+        system = OrbitalSystem(engine = engine)
+        system.set_softening(softening)
+        system.add_entity(diameter = 0.001, mass = 1.989e30, position = (0, 0))
+        system.add_particles([(0.01, 0)])
+        system.step(1e-3)
+        velocities.append(system.velocities()[1])
+    assert velocities[0][0] < 0
+    np.testing.assert_allclose(velocities[0], velocities[1], rtol = 1e-9, atol = 1e-15)
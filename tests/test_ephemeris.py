@@ -0,0 +1,29 @@
+import numpy as np
+import pytest
+
+from orbitalsim.environment import OrbitalSystem
+
+def test_fit_ephemeris_rejects_merging_collisions():
+    system = OrbitalSystem(engine = 'numpy')
+    system.add_entity(diameter = 0.1, mass = 1e20, position = (0, 0))
+    system.add_entity(diameter = 0.1, mass = 1e10, position = (0.05, 0))
+    system.set_collisions('merge', log = False)
+    with pytest.raises(ValueError, match = 'ephemeris'):
+        system.fit_ephemeris(10)
+    # nothing was propagated
+    assert system.time == 0
+    assert len(system.entities) == 2
+
+def test_velocity_queries_match_the_derivative():
+    system = OrbitalSystem(engine = 'numpy')
+    system.add_entity(diameter = 0.01, mass = 1.989e30, position = (0, 0))
+    system.add_entity(diameter = 0.001, mass = 6e24, position = (1, 0), speed = 0.0172, angle = 0)
+    ephemeris = system.fit_ephemeris(40, dt = 0.25, span = 8)
+    times = np.linspace(0, 40, 17)
+    velocities = ephemeris.velocities(times)
+    # scalar queries use the cached derivative and agree with the batched evaluation
+    for time, expected in zip(times, velocities):
+        np.testing.assert_allclose(ephemeris.velocities(time), expected, rtol = 1e-12, atol = 1e-15)
+    # the earth keeps its (circular) orbital speed
+    np.testing.assert_allclose(np.hypot(velocities[:, 1, 0], velocities[:, 1, 1]), 0.0172, rtol = 0.01)
+    assert ephemeris.derivative() is ephemeris.derivative()
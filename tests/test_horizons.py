@@ -0,0 +1,44 @@
+import datetime
+
+from orbitalsim.horizons import HorizonsCache, julian_date
+from orbitalsim.simulation import Simulation
+
+def fake_horizons(calls):
+    # stand-in backend recording every query it answers
+    def backend(entity_id, observer_id, epoch):
+        calls.append((entity_id, observer_id, epoch))
+        return {'name': 'Body ({})'.format(entity_id), 'x': 1.0, 'y': 0.0, 'vx': 0.0, 'vy': 0.017, 'e': 0.0, 'a': 1.0}
+    return backend
+
+def test_miss_then_hit(tmp_path):
+    calls = []
+    cache = HorizonsCache(str(tmp_path), backend = fake_horizons(calls))
+    epoch = julian_date(datetime.datetime(2020, 1, 1, 18))
+
+    first = cache.fetch('399', 'sun', epoch)
+    assert (cache.misses, cache.hits) == (1, 0)
+    second = cache.fetch('399', 'sun', epoch)
+    assert (cache.misses, cache.hits) == (1, 1)
+    assert second == first
+    # the backend was queried once, at the exact epoch asked for
+    assert calls == [('399', 'sun', epoch)]
+    assert len(cache.entries()) == 1
+
+def test_default_start_date_hits_cache_on_repeat_startup(tmp_path):
+    calls = []
+    cache = HorizonsCache(str(tmp_path), backend = fake_horizons(calls))
+    for _ in range(2):
+        s = Simulation()
+        s.horizons = cache
+        s.get_horizons_positioning('399', 'sun')
+    assert (cache.misses, cache.hits) == (1, 1)
+    assert len(calls) == 1
+
+def test_resolution_rounds_epochs_to_the_day(tmp_path):
+    calls = []
+    cache = HorizonsCache(str(tmp_path), backend = fake_horizons(calls), resolution = 1)
+    epoch = julian_date(datetime.datetime(2020, 1, 1, 9, 30))
+    cache.fetch('399', 'sun', epoch)
+    cache.fetch('399', 'sun', epoch + 0.25)
+    assert (cache.misses, cache.hits) == (1, 1)
+    assert [call[2] for call in calls] == [julian_date(datetime.datetime(2020, 1, 1))]
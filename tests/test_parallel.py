@@ -0,0 +1,59 @@
+import gc
+import multiprocessing
+
+import numpy as np
+import pytest
+
+from orbitalsim.engine import DirectSolver
+from orbitalsim.environment import OrbitalSystem
+from orbitalsim.parallel import ParallelSolver
+
+def make_system(n, seed = 0):
+    rng = np.random.default_rng(seed)
+    system = OrbitalSystem(engine = 'numpy')
+    for position in rng.uniform(-5, 5, (n, 2)):
+        system.add_entity(diameter = 1e-3, mass = float(rng.uniform(1e22, 1e26)), position = tuple(position), speed = 0.01, angle = float(rng.uniform(0, 6)))
+    return system
+
+@pytest.mark.parametrize('softening', [0, 0.05])
+def test_matches_direct_solver_bit_for_bit(softening):
+    # a small block_size splits the targets into many blocks, shared unevenly between the workers
+    rng = np.random.default_rng(1)
+    targets = rng.uniform(-5, 5, (300, 2))
+    sources = rng.uniform(-5, 5, (200, 2))
+    masses = rng.uniform(1e20, 1e26, 200)
+    direct = DirectSolver(block_size = 1000, softening = softening)
+    parallel = ParallelSolver(processes = 3, threshold = 0, block_size = 1000, softening = softening)
+    try:
+        for _ in range(2):
+            np.testing.assert_array_equal(parallel.accelerations(targets, sources, masses), direct.accelerations(targets, sources, masses))
+        assert len(parallel.workers) == 3
+    finally:
+        parallel.close()
+
+def test_propagation_matches_direct_solver_bit_for_bit():
+    systems = [make_system(30), make_system(30)]
+    systems[1].set_solver('parallel', processes = 2, threshold = 0)
+    for system in systems:
+        system.propagate(5, dt = 0.5)
+    systems[1].set_solver('direct')
+    np.testing.assert_array_equal(systems[0].positions(), systems[1].positions())
+    np.testing.assert_array_equal(systems[0].velocities(), systems[1].velocities())
+
+def test_replaced_solver_stops_its_workers():
+    system = make_system(20)
+    for _ in range(2):
+        system.set_solver('parallel', processes = 2, threshold = 0)
+        system.step(0.1)
+        assert len(multiprocessing.active_children()) == 2
+    system.set_solver('direct')
+    assert multiprocessing.active_children() == []
+
+def test_unreferenced_solver_stops_its_workers():
+    system = make_system(20)
+    system.set_solver('parallel', processes = 2, threshold = 0)
+    system.step(0.1)
+    assert len(multiprocessing.active_children()) == 2
+    del system
+    gc.collect()
+    assert multiprocessing.active_children() == []
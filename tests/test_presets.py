@@ -0,0 +1,51 @@
+import threading
+import time
+
+import pytest
+
+from orbitalsim.horizons import HorizonsCache
+from orbitalsim.presets import Preset
+
+class SlowHorizons():
+    # stand-in backend taking up to `latency` seconds per body (varying with the id, so that the fetches
+    # complete out of order) and tracking how many bodies are in flight
+    def __init__(self, latency):
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.active = 0
+        self.peak = 0
+
+    def __call__(self, entity_id, observer_id, epoch):
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(self.latency * (1 + int(entity_id) % 3) / 3)
+        with self.lock:
+            self.active -= 1
+        if entity_id == observer_id:
+            return {'name': 'Sun (10)'}
+        r = int(entity_id)
+        return {'name': 'Body ({})'.format(entity_id), 'x': r, 'y': 0.0, 'vx': 0.0, 'vy': 0.01, 'e': 0.0, 'a': r}
+
+def load(tmp_path, backend, max_workers):
+    preset = Preset(start_date = '2020-01-01', horizons = True)
+    preset.horizons = HorizonsCache(str(tmp_path), backend = backend)
+    preset.entity_data = {str(i): {'m': 1e24, 'd': 1e-5} for i in range(10, 0, -1)}
+    begin = time.perf_counter()
+    preset.add_entities('10', max_workers)
+    return preset, time.perf_counter() - begin
+
+def test_concurrent_loading_takes_one_round_trip(tmp_path):
+    backend = SlowHorizons(0.2)
+    preset, seconds = load(tmp_path, backend, max_workers = 20)
+    assert backend.peak == 10
+    assert seconds == pytest.approx(0.2, abs = 0.15)
+    # added in the order of entity_data, however the fetches completed
+    assert preset.solar_system.names() == ['Sun (10)'] + ['Body ({})'.format(i) for i in range(9, 0, -1)]
+
+def test_concurrent_requests_are_bounded(tmp_path):
+    # every body is two Horizons requests, so max_workers = 4 fetches two bodies at a time
+    backend = SlowHorizons(0.05)
+    preset, _ = load(tmp_path, backend, max_workers = 4)
+    assert backend.peak == 2
+    assert len(preset.solar_system.entities) == 10
@@ -0,0 +1,25 @@
+import datetime
+import time
+
+import pytest
+
+from orbitalsim.simulation import Simulation
+from orbitalsim.worker import PhysicsWorker
+
+def test_worker_publishes_the_date_without_touching_the_simulation():
+    s = Simulation(start_date = '2020-01-01', sim_rate = 200)
+    s.add_custom_entity(position = (0, 0), mass = 1.989e30, diameter = 0.01)
+    s.scheduler.dt = 0.5
+    worker = PhysicsWorker(s)
+    worker.start()
+    time.sleep(0.2)
+    worker.stop(5)
+    worker.check()
+
+    snapshot = worker.front
+    assert snapshot.steps > 0
+    # the simulation's date is only changed by the thread rendering it
+    assert (s.date, s.date_accumulator) == (datetime.datetime(2020, 1, 1), 0)
+    # the published date covers the published time (less any days not yet added to it)
+    elapsed = (snapshot.date - datetime.datetime(2020, 1, 1)).total_seconds() / 86400
+    assert elapsed + snapshot.date_accumulator == pytest.approx(snapshot.time)